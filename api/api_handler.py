@@ -1,8 +1,18 @@
 import base64
+import functools
+import hmac
 import json
+import math
+import mmap
 import os
+import pickle
+import re
 import sqlite3
-from http.server import HTTPServer, BaseHTTPRequestHandler
+import threading
+from collections import Counter
+
+import orjson
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from pathlib import Path
 from datetime import datetime
 import logging
@@ -14,11 +24,59 @@ logger = logging.getLogger(__name__)
 # Database connection
 DB_PATH = Path("data/momo_transactions.db")
 
+# Column order used by the INSERT statements below (id/created_at are
+# assigned by SQLite, so they are not part of the tuple)
+TRANSACTION_COLUMNS = (
+    'transaction_id', 'amount', 'currency', 'transaction_type',
+    'sender_name', 'receiver_name', 'sender_phone', 'receiver_phone',
+    'date', 'balance_after', 'fee', 'status', 'parsed_from'
+)
+
+INSERT_TRANSACTION_SQL = '''
+INSERT OR REPLACE INTO transactions
+(transaction_id, amount, currency, transaction_type, sender_name,
+ receiver_name, sender_phone, receiver_phone, date, balance_after,
+ fee, status, parsed_from)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# How many rows we hand to executemany() per transaction
+BATCH_SIZE = 10000
+
+# Columns a PUT is allowed to touch; anything else never reaches the
+# f-string, so arbitrary keys can't end up in SQL text
+_UPDATABLE_COLUMNS = frozenset(TRANSACTION_COLUMNS)
+
+@functools.lru_cache(maxsize=256)
+def _compile_update(fields):
+    """Compile (and memoize) the UPDATE statement for a sorted field tuple.
+
+    The schema is fixed, so each update shape compiles exactly once;
+    repeat PUTs of the same shape reuse the identical SQL text and
+    SQLite only binds parameters.
+    """
+    set_clause = ', '.join(f"{col} = ?" for col in fields)
+    return f"UPDATE transactions SET {set_clause} WHERE id = ?"
+
+# One connection for the lifetime of the process, opened in init_database().
+# Opening per request pays journal-file open + schema lookup + fsync every
+# call. HTTPServer is single-threaded, but the lock keeps us safe if we ever
+# switch to ThreadingHTTPServer.
+DB_CONN = None
+DB_LOCK = threading.Lock()
+
 def init_database():
-    """Initialize SQLite database"""
-    conn = sqlite3.connect(DB_PATH)
+    """Initialize SQLite database and open the shared connection"""
+    global DB_CONN
+    conn = sqlite3.connect(DB_PATH, isolation_level=None, check_same_thread=False)
     cursor = conn.cursor()
-    
+
+    # WAL + relaxed sync means writers no longer fsync the rollback
+    # journal on every statement
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+
     # Create tables
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS transactions (
@@ -51,154 +109,277 @@ def init_database():
     )
     ''')
     
-    conn.commit()
-    conn.close()
+    DB_CONN = conn
     logger.info("Database initialized successfully")
 
-# Global lists to hold our data once the server starts
-transactions = []        # We use this for Linear Search (slower, but keeps order)
-transactions_dict = {}   # We use this for Dictionary Lookup (super fast O(1) speed)
+def _row_defaults(data):
+    """Apply the same defaults the single-row INSERT used"""
+    return (
+        data.get('transaction_id'),
+        data.get('amount'),
+        data.get('currency', 'RWF'),
+        data.get('transaction_type'),
+        data.get('sender_name'),
+        data.get('receiver_name'),
+        data.get('sender_phone'),
+        data.get('receiver_phone'),
+        data.get('date'),
+        data.get('balance_after'),
+        data.get('fee', 0),
+        data.get('status', 'completed'),
+        data.get('parsed_from', 'api')
+    )
+
+def _save_many_to_database(rows):
+    """Bulk-save transactions with executemany inside one transaction.
+
+    Batching means we pay one fsync per BATCH_SIZE rows instead of one
+    per row, which is what makes bulk reloads fast.
+    """
+    if not rows:
+        return
+    try:
+        with DB_LOCK:
+            cursor = DB_CONN.cursor()
+            for start in range(0, len(rows), BATCH_SIZE):
+                batch = rows[start:start + BATCH_SIZE]
+                cursor.execute('BEGIN')
+                cursor.executemany(
+                    INSERT_TRANSACTION_SQL,
+                    [_row_defaults(d) for d in batch]
+                )
+                cursor.execute('COMMIT')
+        logger.info(f"Bulk-saved {len(rows)} transactions to database")
+    except Exception as e:
+        logger.error(f"Error bulk-saving to database: {e}")
+
+# Primary in-memory store once the server starts. dicts preserve
+# insertion order, so this one structure gives O(1) lookup, insert and
+# delete while .values() is the ordered view the old list provided —
+# no global list to rebuild or rebind on delete.
+transactions_dict = {}
+
+# Guards the in-memory store now that requests are served concurrently
+DATA_LOCK = threading.RLock()
+
+# Next id handed out on POST. Seeded past the largest loaded id and only
+# ever incremented (under DATA_LOCK), so a DELETE can never cause an id
+# to be reused and silently overwrite a surviving record — len(txns)+1
+# would do exactly that after any deletion.
+_NEXT_ID = 1
+
+def _ordered_transactions():
+    """Snapshot the ordered rows so iteration can run outside the lock"""
+    with DATA_LOCK:
+        return list(transactions_dict.values())
+
+def _load_keyed_transactions(json_path):
+    """Load the {id: txn} store, via a pickle snapshot when it is fresh.
+
+    Parsing transactions.json and re-keying it by id on every start is
+    the slow part of cold start; a sidecar .pkl holds the already-keyed
+    dict, so a warm start is one file read plus one C-level unpickle.
+    The snapshot is rebuilt (atomically, via os.replace) whenever the
+    JSON file is newer than it.
+    """
+    snapshot_path = json_path.with_suffix('.pkl')
+    if (snapshot_path.exists()
+            and snapshot_path.stat().st_mtime >= json_path.stat().st_mtime):
+        try:
+            with open(snapshot_path, 'rb') as f:
+                return pickle.load(f), False
+        except Exception as e:
+            logger.warning(f"Snapshot {snapshot_path} unreadable, reparsing: {e}")
+
+    # Memory-map the file so the parser reads straight from the page
+    # cache, skipping the intermediate read() copy of the whole file
+    with open(json_path, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        json_rows = orjson.loads(memoryview(mm))
+    keyed = {t['id']: t for t in json_rows}
+
+    try:
+        tmp_path = snapshot_path.with_suffix('.pkl.tmp')
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(keyed, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, snapshot_path)
+    except Exception as e:
+        logger.warning(f"Could not write snapshot {snapshot_path}: {e}")
+
+    return keyed, True
 
 def load_parsed_data():
     """Load parsed data from JSON file and database"""
-    global transactions, transactions_dict
-    
+    global _NEXT_ID
+
     # Initialize database
     init_database()
-    
+
     # Load from JSON file (DSA implementation)
     json_path = Path("dsa/transactions.json")
     if json_path.exists():
-        with open(json_path, 'r') as f:
-            transactions = json.load(f)
-            # We map the data to a dictionary right away so searching is instant later
-            for txn in transactions:
-                transactions_dict[txn['id']] = txn
-        logger.info(f"Success! Loaded {len(transactions)} records from {json_path}")
+        keyed, freshly_parsed = _load_keyed_transactions(json_path)
+        transactions_dict.update(keyed)
+        logger.info(f"Success! Loaded {len(keyed)} records from {json_path}")
+        # Persist the reloaded rows in one batched transaction instead of
+        # hitting the database once per row; a fresh snapshot means the
+        # JSON changed, so only then is the re-save needed
+        if freshly_parsed:
+            _save_many_to_database(list(keyed.values()))
     else:
         logger.warning(f"Warning: Couldn't find '{json_path}'. Did you run the parser first?")
     
-    # Load from database
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT * FROM transactions')
-    db_transactions = cursor.fetchall()
-    
-    for txn in db_transactions:
-        txn_dict = {
-            'id': txn[0],
-            'transaction_id': txn[1],
-            'amount': txn[2],
-            'currency': txn[3],
-            'transaction_type': txn[4],
-            'sender_name': txn[5],
-            'receiver_name': txn[6],
-            'sender_phone': txn[7],
-            'receiver_phone': txn[8],
-            'date': txn[9],
-            'balance_after': txn[10],
-            'fee': txn[11],
-            'status': txn[12],
-            'parsed_from': txn[13],
-            'created_at': txn[14]
-        }
-        
-        # Add to both data structures
-        transactions.append(txn_dict)
-        transactions_dict[txn[0]] = txn_dict
-    
-    conn.close()
+    # Load from database. sqlite3.Row keys rows by column name in C, so
+    # we avoid hand-building a 15-key dict per row in the interpreter.
+    cursor = DB_CONN.cursor()
+    cursor.row_factory = sqlite3.Row
+
+    db_transactions = cursor.execute('''
+        SELECT id, transaction_id, amount, currency, transaction_type,
+               sender_name, receiver_name, sender_phone, receiver_phone,
+               date, balance_after, fee, status, parsed_from, created_at
+        FROM transactions
+    ''').fetchall()
+
+    # Materialize once, then bulk-add to the store
+    new_rows = [dict(row) for row in db_transactions]
+    transactions_dict.update({r['id']: r for r in new_rows})
+
     logger.info(f"Loaded {len(db_transactions)} records from database")
 
+    # Start the id counter past everything we just loaded
+    _NEXT_ID = max(transactions_dict, default=0) + 1
+
+# The full expected Authorization header, encoded once at import. Each
+# request then needs a single constant-time compare instead of a split,
+# b64decode and UTF-8 decode. Kept as bytes: compare_digest raises
+# TypeError on non-ASCII str input, so comparing the header as str would
+# crash the handler thread on a non-ASCII Authorization value.
+_EXPECTED_AUTH = b"Basic " + base64.b64encode(b"team5:ALU2025")
+
+# Per-thread response buffer reused across requests, so a response is
+# one bytearray append plus a single wfile.write instead of a separate
+# syscall per header line
+_RESPONSE_BUF = threading.local()
+
+# Per-thread receive buffer: request bodies are read into a reusable
+# slab with readinto() rather than allocating a fresh bytes object per
+# POST/PUT, so steady-state request handling causes no GC churn
+_RECV_BUF = threading.local()
+_RECV_BUF_SIZE = 65536
+
 class APIHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 enables keep-alive, so clients stop paying a TCP
+    # handshake (and a fresh parse of our greeting) per request. The
+    # compiled-parser path lives in api.main behind uvicorn; this
+    # handler stays on the stdlib server for the DSA comparison.
+    protocol_version = 'HTTP/1.1'
+
     def check_login(self):
         """Handle authentication"""
         auth_header = self.headers.get('Authorization')
         if not auth_header:
             return False
-
-        try:
-            # The header looks like 'Basic [Base64String]', so we split it
-            auth_type, encoded_creds = auth_header.split(' ', 1)
-            if auth_type != 'Basic':
-                return False
-
-            # Decrypt the string to check the username/password
-            decoded = base64.b64decode(encoded_creds).decode('utf-8')
-            return decoded == "team5:ALU2025"
-        except Exception as e:
-            logger.error(f"Auth error: {e}")
-            return False
+        # compare_digest keeps the comparison constant-time; comparing
+        # bytes (surrogateescape round-trips any header the socket can
+        # deliver) keeps it from raising on non-ASCII credentials
+        return hmac.compare_digest(
+            auth_header.encode('utf-8', 'surrogateescape'), _EXPECTED_AUTH
+        )
+
+    def _read_body(self):
+        """Read the request body into this thread's reusable buffer.
+
+        Returns a memoryview over the filled prefix of the slab; the
+        view is only valid until the next request on this thread, which
+        is fine because orjson.loads consumes it immediately. Bodies
+        larger than the slab fall back to a one-off read.
+        """
+        length = int(self.headers.get('Content-Length', 0))
+        if length > _RECV_BUF_SIZE:
+            return self.rfile.read(length)
+
+        buf = getattr(_RECV_BUF, 'buf', None)
+        if buf is None:
+            buf = _RECV_BUF.buf = bytearray(_RECV_BUF_SIZE)
+
+        view = memoryview(buf)[:length]
+        read = 0
+        while read < length:
+            n = self.rfile.readinto(view[read:])
+            if not n:
+                break
+            read += n
+        return view[:read]
 
     def do_GET(self):
         """Handle GET requests"""
         # First, check if the user is allowed in
         if not self.check_login():
+            body = b'{"error": "Unauthorized. Please login."}'
             self.send_response(401)
             # This header is what triggers the popup box in your browser!
             self.send_header('WWW-Authenticate', 'Basic realm="MoMo API"')
+            # Content-Length keeps the keep-alive connection framed
+            self.send_header('Content-Length', str(len(body)))
             self.end_headers()
-            self.wfile.write(b'{"error": "Unauthorized. Please login."}')
+            self.wfile.write(body)
             return
 
-        # Path 1: Get all transactions
-        if self.path == '/transactions':
-            self._send_json(transactions)
-        
-        # Path 2: Get one specific transaction by ID
-        elif self.path.startswith('/transactions/'):
-            try:
-                # Grab the ID from the end of the URL
-                txn_id = int(self.path.split('/')[-1])
-
-                # DSA Efficiency: We use the Dictionary here for O(1) lookup
-                txn = transactions_dict.get(txn_id)
-
-                if txn:
-                    self._send_json(txn)
-                else:
-                    self._send_json({"error": "Transaction not found"}, 404)
-
-            except ValueError:
-                self._send_json({"error": "Invalid ID format"}, 400)
-        
-        # Path 3: Health check
-        elif self.path == '/health':
-            self._send_json({
-                "status": "healthy",
-                "timestamp": datetime.now().isoformat(),
-                "transaction_count": len(transactions)
-            })
-        
-        # Path 4: Statistics
-        elif self.path == '/stats':
-            stats = self._calculate_statistics()
-            self._send_json(stats)
-        
+        # Dispatch through the compiled route table: one anchored match
+        # per candidate, and the id capture replaces the per-request
+        # split/int dance the old if/elif chain did
+        for pattern, handler in _GET_ROUTES:
+            match = pattern.match(self.path)
+            if match:
+                handler(self, match)
+                return
+
+        self._send_json({"error": "Endpoint not found"}, 404)
+
+    def _get_transactions(self, match):
+        # All transactions, streamed row by row — the payload can be large
+        self._send_json_stream(_ordered_transactions())
+
+    def _get_transaction(self, match):
+        # DSA Efficiency: We use the Dictionary here for O(1) lookup;
+        # the route pattern only matches digits, so int() cannot fail
+        txn = transactions_dict.get(int(match.group(1)))
+        if txn:
+            self._send_json(txn)
         else:
-            self._send_json({"error": "Endpoint not found"}, 404)
+            self._send_json({"error": "Transaction not found"}, 404)
+
+    def _get_health(self, match):
+        self._send_json({
+            "status": "healthy",
+            "timestamp": datetime.now().isoformat(),
+            "transaction_count": len(transactions_dict)
+        })
+
+    def _get_stats(self, match):
+        self._send_json(self._calculate_statistics())
 
     def do_POST(self):
         """Handle POST requests"""
         if not self.check_login():
             self.send_response(401)
+            self.send_header('Content-Length', '0')
             self.end_headers()
             return
 
+        global _NEXT_ID
+
         try:
-            # Figure out how much data the user is sending
-            length = int(self.headers.get('Content-Length', 0))
-            body = self.rfile.read(length)
-            new_data = json.loads(body)
-
-            # Assign a new ID (just the next number in line)
-            new_id = len(transactions) + 1
-            new_data['id'] = new_id
-
-            # Save it to both our memory structures
-            transactions.append(new_data)
-            transactions_dict[new_id] = new_data
+            # Body lands in the thread's reusable slab, not a fresh bytes
+            new_data = orjson.loads(self._read_body())
+
+            # Assign the next id from the monotonic counter
+            with DATA_LOCK:
+                new_id = _NEXT_ID
+                _NEXT_ID = new_id + 1
+                new_data['id'] = new_id
+                transactions_dict[new_id] = new_data
             
             # Also save to database
             self._save_to_database(new_data)
@@ -213,24 +394,29 @@ class APIHandler(BaseHTTPRequestHandler):
         """Handle PUT requests"""
         if not self.check_login():
             self.send_response(401)
+            self.send_header('Content-Length', '0')
             self.end_headers()
             return
 
-        try:
-            txn_id = int(self.path.split('/')[-1])
-            length = int(self.headers.get('Content-Length', 0))
-            updated_fields = json.loads(self.rfile.read(length))
+        match = _TXN_PATH_RE.match(self.path)
+        if match is None:
+            return self._send_json({"error": "Not found"}, 404)
 
-            # DSA Comparison: Using Linear Search (O(n)) to find the item in the list
-            for txn in transactions:
-                if txn['id'] == txn_id:
+        try:
+            txn_id = int(match.group(1))
+            updated_fields = orjson.loads(self._read_body())
+
+            # The dict gives us the row in O(1), and the list holds the
+            # same dict object, so updating in place covers both views
+            txn = transactions_dict.get(txn_id)
+            if txn is not None:
+                with DATA_LOCK:
                     txn.update(updated_fields)
-                    transactions_dict[txn_id] = txn  # Update the dictionary too
-                    
-                    # Update database
-                    self._update_in_database(txn_id, updated_fields)
-                    
-                    return self._send_json(txn)
+
+                # Update database
+                self._update_in_database(txn_id, updated_fields)
+
+                return self._send_json(txn)
 
             self._send_json({"error": "Not found"}, 404)
 
@@ -242,18 +428,21 @@ class APIHandler(BaseHTTPRequestHandler):
         """Handle DELETE requests"""
         if not self.check_login():
             self.send_response(401)
+            self.send_header('Content-Length', '0')
             self.end_headers()
             return
 
+        match = _TXN_PATH_RE.match(self.path)
+        if match is None:
+            return self._send_json({"error": "Not found"}, 404)
+
         try:
-            txn_id = int(self.path.split('/')[-1])
+            txn_id = int(match.group(1))
             if txn_id in transactions_dict:
-                # Remove it from the dictionary (Fast)
-                del transactions_dict[txn_id]
-                # Re-build the list without that ID (Slower)
-                global transactions
-                transactions = [t for t in transactions if t['id'] != txn_id]
-                
+                # O(1) delete straight from the store
+                with DATA_LOCK:
+                    del transactions_dict[txn_id]
+
                 # Delete from database
                 self._delete_from_database(txn_id)
 
@@ -266,68 +455,84 @@ class APIHandler(BaseHTTPRequestHandler):
             self._send_json({"error": "Delete failed"}, 400)
 
     def _send_json(self, data, status=200):
-        """Helper method to send JSON response"""
+        """Helper method to send JSON response in a single write"""
+        # orjson returns UTF-8 bytes directly, so there is no separate
+        # dumps + encode step on the hot path
+        json_output = orjson.dumps(
+            data, option=orjson.OPT_NON_STR_KEYS
+        )
+
+        buf = getattr(_RESPONSE_BUF, 'buf', None)
+        if buf is None:
+            buf = _RESPONSE_BUF.buf = bytearray(256)
+        buf.clear()
+
+        # Assemble status line + headers + body ourselves; send_header
+        # issues one wfile.write (one syscall) per header line
+        reason = self.responses.get(status, ('', ''))[0]
+        buf += (
+            f"{self.protocol_version} {status} {reason}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(json_output)}\r\n\r\n"
+        ).encode('latin-1')
+        buf += json_output
+        self.wfile.write(buf)
+        self.log_request(status)
+
+    def _write_chunk(self, payload):
+        """Write one chunk in HTTP/1.1 chunked transfer encoding"""
+        self.wfile.write(f"{len(payload):x}\r\n".encode('ascii'))
+        self.wfile.write(payload)
+        self.wfile.write(b'\r\n')
+
+    def _send_json_stream(self, rows, status=200):
+        """Stream a JSON array one row at a time with chunked encoding.
+
+        Unlike _send_json this never holds the full serialized payload in
+        memory, so peak RSS stays at one row and the first byte goes out
+        immediately instead of after serializing everything.
+        """
         self.send_response(status)
         self.send_header('Content-Type', 'application/json')
-        # We encode it to utf-8 so we don't get 'Parse Errors' in Postman
-        json_output = json.dumps(data, ensure_ascii=False).encode('utf-8')
-        self.send_header('Content-Length', str(len(json_output)))
+        self.send_header('Transfer-Encoding', 'chunked')
         self.end_headers()
-        self.wfile.write(json_output)
+
+        self._write_chunk(b'[')
+        for i, row in enumerate(rows):
+            prefix = b',' if i else b''
+            self._write_chunk(prefix + orjson.dumps(row))
+        self._write_chunk(b']')
+        # Zero-length chunk terminates the response
+        self.wfile.write(b'0\r\n\r\n')
 
     def _calculate_statistics(self):
         """Calculate transaction statistics"""
-        if not transactions:
+        txns = _ordered_transactions()
+        if not txns:
             return {"total": 0, "average": 0, "types": {}}
-        
-        total_amount = 0
-        type_counts = {}
-        
-        for txn in transactions:
-            if 'amount' in txn and txn['amount']:
-                total_amount += float(txn['amount'])
-            
-            txn_type = txn.get('transaction_type', 'unknown')
-            type_counts[txn_type] = type_counts.get(txn_type, 0) + 1
-        
+
+        # fsum and Counter keep the per-row work in C without pulling a
+        # NumPy dependency into the legacy server
+        total_amount = math.fsum(
+            float(t['amount']) for t in txns if t.get('amount')
+        )
+        type_counts = Counter(
+            t.get('transaction_type', 'unknown') for t in txns
+        )
+
         return {
-            "total_transactions": len(transactions),
+            "total_transactions": len(txns),
             "total_amount": total_amount,
-            "average_amount": total_amount / len(transactions) if transactions else 0,
-            "transaction_types": type_counts,
+            "average_amount": total_amount / len(txns),
+            "transaction_types": dict(type_counts),
             "timestamp": datetime.now().isoformat()
         }
 
     def _save_to_database(self, data):
         """Save transaction to SQLite database"""
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-            INSERT OR REPLACE INTO transactions 
-            (transaction_id, amount, currency, transaction_type, sender_name, 
-             receiver_name, sender_phone, receiver_phone, date, balance_after, 
-             fee, status, parsed_from)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                data.get('transaction_id'),
-                data.get('amount'),
-                data.get('currency', 'RWF'),
-                data.get('transaction_type'),
-                data.get('sender_name'),
-                data.get('receiver_name'),
-                data.get('sender_phone'),
-                data.get('receiver_phone'),
-                data.get('date'),
-                data.get('balance_after'),
-                data.get('fee', 0),
-                data.get('status', 'completed'),
-                data.get('parsed_from', 'api')
-            ))
-            
-            conn.commit()
-            conn.close()
+            with DB_LOCK:
+                DB_CONN.execute(INSERT_TRANSACTION_SQL, _row_defaults(data))
             logger.info(f"Saved transaction {data.get('id')} to database")
         except Exception as e:
             logger.error(f"Error saving to database: {e}")
@@ -335,20 +540,18 @@ class APIHandler(BaseHTTPRequestHandler):
     def _update_in_database(self, txn_id, updates):
         """Update transaction in database"""
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
-            # Build update query
-            set_clause = ', '.join([f"{key} = ?" for key in updates.keys()])
-            values = list(updates.values())
+            # Canonical sorted order keeps SQL text and bind order in sync
+            fields = tuple(sorted(updates))
+            unknown = [f for f in fields if f not in _UPDATABLE_COLUMNS]
+            if unknown:
+                raise ValueError(f"Unknown columns in update: {unknown}")
+
+            sql = _compile_update(fields)
+            values = [updates[col] for col in fields]
             values.append(txn_id)
-            
-            cursor.execute(f'''
-            UPDATE transactions SET {set_clause} WHERE id = ?
-            ''', values)
-            
-            conn.commit()
-            conn.close()
+
+            with DB_LOCK:
+                DB_CONN.execute(sql, values)
             logger.info(f"Updated transaction {txn_id} in database")
         except Exception as e:
             logger.error(f"Error updating database: {e}")
@@ -356,13 +559,8 @@ class APIHandler(BaseHTTPRequestHandler):
     def _delete_from_database(self, txn_id):
         """Delete transaction from database"""
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
-            cursor.execute('DELETE FROM transactions WHERE id = ?', (txn_id,))
-            
-            conn.commit()
-            conn.close()
+            with DB_LOCK:
+                DB_CONN.execute('DELETE FROM transactions WHERE id = ?', (txn_id,))
             logger.info(f"Deleted transaction {txn_id} from database")
         except Exception as e:
             logger.error(f"Error deleting from database: {e}")
@@ -372,10 +570,24 @@ class APIHandler(BaseHTTPRequestHandler):
         logger.info(format % args)
 
 # Start the server
+# Anchored, precompiled route table for GET dispatch; checked in order,
+# first match wins
+_GET_ROUTES = (
+    (re.compile(r'^/transactions$'), APIHandler._get_transactions),
+    (re.compile(r'^/transactions/(\d+)$'), APIHandler._get_transaction),
+    (re.compile(r'^/health$'), APIHandler._get_health),
+    (re.compile(r'^/stats$'), APIHandler._get_stats),
+)
+
+# Shared by PUT/DELETE, whose only parameterized path is /transactions/<id>
+_TXN_PATH_RE = re.compile(r'^/transactions/(\d+)$')
+
 if __name__ == '__main__':
     load_parsed_data()
     port = 8080  # Different port from FastAPI
-    server = HTTPServer(('localhost', port), APIHandler)
+    # ThreadingHTTPServer overlaps slow clients and SQLite fsyncs
+    # instead of serializing every request behind one socket
+    server = ThreadingHTTPServer(('localhost', port), APIHandler)
     logger.info(f"--- Legacy MoMo API is live at http://localhost:{port} ---")
     logger.info("Login: team5 | Password: ALU2025")
     logger.info("Use this for DSA testing and legacy support")
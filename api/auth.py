@@ -0,0 +1,37 @@
+"""
+Authentication helpers for the MoMo SMS Analytics API
+Team Eight: James Giir Deng & Byusa M Martin De Poles
+"""
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from passlib.context import CryptContext
+from jose import jwt
+
+# Secret used to sign access tokens; override in production
+SECRET_KEY = os.getenv("SECRET_KEY", "team8-momo-sms-analytics-secret")
+ALGORITHM = "HS256"
+ACCESS_TOKEN_EXPIRE_MINUTES = 30
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Check a plain password against its bcrypt hash"""
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def get_password_hash(password: str) -> str:
+    """Hash a password for storage"""
+    return pwd_context.hash(password)
+
+
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+    """Create a signed JWT access token"""
+    to_encode = data.copy()
+    expire = datetime.utcnow() + (
+        expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    to_encode.update({"exp": expire})
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
@@ -1,14 +1,25 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_, func, desc
+from sqlalchemy.orm import (
+    Session, joinedload, selectinload, raiseload, undefer, undefer_group,
+    load_only
+)
+from sqlalchemy import or_, and_, func, desc, text
+from sqlalchemy.exc import OperationalError
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 from decimal import Decimal
 import logging
+import os
+import orjson
 from . import models, schemas
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# With DEBUG on, list queries add raiseload("*") so any lazy access to a
+# relationship we forgot to eager-load raises InvalidRequestError in
+# dev/CI instead of silently issuing one SELECT per row
+DEBUG = os.getenv("DEBUG", "false").lower() in ("1", "true", "yes")
+
 # User CRUD Operations
 def get_user(db: Session, user_id: int):
     return db.query(models.User).filter(models.User.id == user_id).first()
@@ -28,7 +39,6 @@ def create_user(db: Session, user: schemas.UserCreate):
     )
     db.add(db_user)
     db.commit()
-    db.refresh(db_user)
     return db_user
 
 def update_user(db: Session, user_id: int, user_update: schemas.UserUpdate):
@@ -41,7 +51,6 @@ def update_user(db: Session, user_id: int, user_update: schemas.UserUpdate):
         setattr(db_user, field, value)
     
     db.commit()
-    db.refresh(db_user)
     return db_user
 
 def delete_user(db: Session, user_id: int):
@@ -55,7 +64,17 @@ def delete_user(db: Session, user_id: int):
 
 # SMS Record CRUD Operations
 def get_sms_record(db: Session, sms_id: int):
-    return db.query(models.SMSRecord).filter(models.SMSRecord.id == sms_id).first()
+    # Eager-load everything the detail endpoint touches in one go:
+    # joinedload for the many-to-one user FKs, selectinload for the
+    # many-to-many categories so the join doesn't multiply rows
+    return db.query(models.SMSRecord).options(
+        joinedload(models.SMSRecord.sender),
+        joinedload(models.SMSRecord.receiver),
+        selectinload(models.SMSRecord.categories),
+        # Detail view shows everything — pull the deferred wide columns
+        # in the same SELECT instead of a lazy load per group access
+        undefer_group('content')
+    ).filter(models.SMSRecord.id == sms_id).first()
 
 def get_sms_by_transaction_id(db: Session, transaction_id: str):
     return db.query(models.SMSRecord).filter(
@@ -70,10 +89,21 @@ def get_sms_records(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     min_amount: Optional[Decimal] = None,
-    max_amount: Optional[Decimal] = None
+    max_amount: Optional[Decimal] = None,
+    after_id: Optional[int] = None
 ):
-    query = db.query(models.SMSRecord)
-    
+    # The list serializer reads body, message and token, so pull the
+    # whole deferred 'content' group in the page query — undeferring a
+    # subset leaves the first deferred access to lazy-load the group
+    # row by row (an N+1 across every row of the page)
+    load_options = [
+        selectinload(models.SMSRecord.categories),
+        undefer_group('content'),
+    ]
+    if DEBUG:
+        load_options.append(raiseload("*"))
+    query = db.query(models.SMSRecord).options(*load_options)
+
     if transaction_type:
         query = query.filter(models.SMSRecord.transaction_type == transaction_type)
     
@@ -88,7 +118,20 @@ def get_sms_records(
     
     if max_amount:
         query = query.filter(models.SMSRecord.amount <= max_amount)
-    
+
+    # Keyset pagination: WHERE id > after_id ORDER BY id LIMIT n walks
+    # the primary key index and costs O(limit) regardless of how deep
+    # the client has paged. OFFSET scans and discards skip rows first,
+    # so it degrades linearly — kept only for clients not yet passing
+    # after_id.
+    if after_id is not None:
+        return (
+            query.filter(models.SMSRecord.id > after_id)
+            .order_by(models.SMSRecord.id)
+            .limit(limit)
+            .all()
+        )
+
     return query.order_by(desc(models.SMSRecord.date)).offset(skip).limit(limit).all()
 
 def create_sms_record(db: Session, sms: schemas.SMSRecordCreate):
@@ -104,7 +147,6 @@ def create_sms_record(db: Session, sms: schemas.SMSRecordCreate):
     )
     db.add(db_sms)
     db.commit()
-    db.refresh(db_sms)
     
     # Log the creation
     log_system_event(
@@ -127,7 +169,6 @@ def update_sms_record(db: Session, sms_id: int, sms_update: schemas.SMSRecordUpd
         setattr(db_sms, field, value)
     
     db.commit()
-    db.refresh(db_sms)
     return db_sms
 
 def delete_sms_record(db: Session, sms_id: int):
@@ -149,13 +190,40 @@ def delete_sms_record(db: Session, sms_id: int):
     return True
 
 def search_sms_records(
-    db: Session, 
+    db: Session,
     search_term: str,
     skip: int = 0,
     limit: int = 50
 ):
-    """Search SMS records by various fields"""
-    return db.query(models.SMSRecord).filter(
+    """Search SMS records by various fields.
+
+    On SQLite the query goes through the sms_fts FTS5 table — an
+    inverted-index lookup instead of four LIKE '%term%' scans. Other
+    backends (or a missing FTS table) fall back to the LIKE query.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        try:
+            rows = db.execute(
+                text(
+                    "SELECT rowid FROM sms_fts WHERE sms_fts MATCH :q "
+                    "LIMIT :limit OFFSET :skip"
+                ),
+                {"q": f'"{search_term}"', "limit": limit, "skip": skip}
+            ).fetchall()
+            ids = [r[0] for r in rows]
+            if not ids:
+                return []
+            return db.query(models.SMSRecord).options(
+                undefer(models.SMSRecord.body)
+            ).filter(
+                models.SMSRecord.id.in_(ids)
+            ).all()
+        except OperationalError:
+            logger.warning("sms_fts unavailable, falling back to LIKE search")
+
+    return db.query(models.SMSRecord).options(
+        undefer(models.SMSRecord.body)
+    ).filter(
         or_(
             models.SMSRecord.body.ilike(f"%{search_term}%"),
             models.SMSRecord.sender_name.ilike(f"%{search_term}%"),
@@ -186,7 +254,6 @@ def create_category(db: Session, category: schemas.TransactionCategoryCreate):
     )
     db.add(db_category)
     db.commit()
-    db.refresh(db_category)
     return db_category
 
 # System Log Operations
@@ -207,7 +274,6 @@ def log_system_event(
     )
     db.add(db_log)
     db.commit()
-    db.refresh(db_log)
     return db_log
 
 def get_system_logs(
@@ -218,8 +284,12 @@ def get_system_logs(
     skip: int = 0,
     limit: int = 100
 ):
-    query = db.query(models.SystemLog)
-    
+    # Batch-load the user relation up front: to_dict(include_user=True)
+    # over a page of logs would otherwise lazy-SELECT one user per row
+    query = db.query(models.SystemLog).options(
+        selectinload(models.SystemLog.user)
+    )
+
     if level:
         query = query.filter(models.SystemLog.level == level)
     
@@ -231,71 +301,200 @@ def get_system_logs(
     
     return query.order_by(desc(models.SystemLog.created_at)).offset(skip).limit(limit).all()
 
+def get_api_access_logs(
+    db: Session,
+    endpoint: Optional[str] = None,
+    status_code: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 100
+):
+    """List API access logs without materializing the heavy columns.
+
+    load_only restricts the SELECT to the fields to_dict serializes —
+    the compressed request/response bodies stay in the database — and
+    the listing is a pure read, so autoflush is suspended for the query.
+    """
+    with db.no_autoflush:
+        query = db.query(models.APIAccessLog).options(
+            load_only(
+                models.APIAccessLog.id,
+                models.APIAccessLog.uuid,
+                models.APIAccessLog.method,
+                models.APIAccessLog.endpoint,
+                models.APIAccessLog.status_code,
+                models.APIAccessLog.user_id,
+                models.APIAccessLog.ip_address,
+                models.APIAccessLog.duration,
+                models.APIAccessLog.response_size,
+                models.APIAccessLog.created_at,
+            )
+        )
+
+        if endpoint:
+            query = query.filter(models.APIAccessLog.endpoint == endpoint)
+        if status_code:
+            query = query.filter(models.APIAccessLog.status_code == status_code)
+
+        return query.order_by(
+            desc(models.APIAccessLog.created_at)
+        ).offset(skip).limit(limit).all()
+
+def get_monthly_volume(db: Session, months: int = 12):
+    """Monthly transaction volumes from the pre-aggregated rollup.
+
+    Reads sms_monthly_rollup (rebuilt by metric_refresher) instead of
+    scanning sms_records — O(months x types) rows regardless of how
+    large the SMS table grows.
+    """
+    rows = db.query(models.SMSMonthlyRollup).order_by(
+        desc(models.SMSMonthlyRollup.year),
+        desc(models.SMSMonthlyRollup.month)
+    ).limit(months * len(models.TransactionType)).all()
+    return [row.to_dict() for row in rows]
+
 # Analytics and Dashboard Functions
+_DASHBOARD_STATS_SQL = text("""
+WITH filtered AS (
+    SELECT id, transaction_type, amount, transaction_date,
+           sender_name, receiver_name
+    FROM sms_records
+    WHERE transaction_date BETWEEN :start_date AND :end_date
+)
+SELECT json_object(
+    'total_transactions', (SELECT COUNT(*) FROM filtered),
+    'total_amount', (SELECT COALESCE(SUM(amount), 0.0) FROM filtered),
+    'average_transaction', (
+        SELECT CASE WHEN COUNT(*) > 0
+                    THEN COALESCE(SUM(amount), 0.0) / COUNT(*)
+                    ELSE 0.0 END
+        FROM filtered
+    ),
+    'transaction_counts', (
+        SELECT COALESCE(json_group_object(transaction_type, cnt), json_object())
+        FROM (SELECT transaction_type, COUNT(*) AS cnt
+              FROM filtered
+              WHERE transaction_type IS NOT NULL
+              GROUP BY transaction_type)
+    ),
+    'daily_volume', (
+        SELECT COALESCE(json_group_array(
+                   json_object('date', d, 'count', c, 'total', t)), json_array())
+        FROM (SELECT date(transaction_date) AS d, COUNT(*) AS c,
+                     COALESCE(SUM(amount), 0.0) AS t
+              FROM filtered
+              GROUP BY date(transaction_date)
+              ORDER BY d)
+    ),
+    'top_senders', (
+        SELECT COALESCE(json_group_array(
+                   json_object('name', n, 'transaction_count', c, 'total_sent', t)),
+               json_array())
+        FROM (SELECT sender_name AS n, COUNT(*) AS c,
+                     COALESCE(SUM(amount), 0.0) AS t
+              FROM filtered
+              WHERE sender_name IS NOT NULL
+              GROUP BY sender_name
+              ORDER BY t DESC LIMIT 10)
+    ),
+    'top_receivers', (
+        SELECT COALESCE(json_group_array(
+                   json_object('name', n, 'transaction_count', c, 'total_received', t)),
+               json_array())
+        FROM (SELECT receiver_name AS n, COUNT(*) AS c,
+                     COALESCE(SUM(amount), 0.0) AS t
+              FROM filtered
+              WHERE receiver_name IS NOT NULL
+              GROUP BY receiver_name
+              ORDER BY t DESC LIMIT 10)
+    )
+)
+""")
+
 def get_dashboard_stats(db: Session, days: int = 30):
-    """Get comprehensive dashboard statistics"""
+    """Get comprehensive dashboard statistics.
+
+    On SQLite the whole payload is assembled by json_object /
+    json_group_array in a single query, so Python only parses the final
+    string once instead of materializing row tuples and nested dicts
+    per metric. Other backends keep the per-metric ORM queries.
+    """
     end_date = datetime.now()
     start_date = end_date - timedelta(days=days)
-    
-    # Total transactions
-    total_txns = db.query(func.count(models.SMSRecord.id)).filter(
+
+    if db.get_bind().dialect.name == "sqlite":
+        try:
+            payload = db.execute(
+                _DASHBOARD_STATS_SQL,
+                {"start_date": start_date, "end_date": end_date}
+            ).scalar()
+            stats = orjson.loads(payload)
+            # Raw SQL sees the stored SMALLINT codes; map them back to
+            # the enum values the API has always exposed
+            stats["transaction_counts"] = {
+                models.TransactionTypeCode._from_code[int(code)].value: count
+                for code, count in (stats.get("transaction_counts") or {}).items()
+            }
+            return stats
+        except OperationalError:
+            logger.warning("SQL-JSON dashboard query unavailable, "
+                           "falling back to per-metric queries")
+
+    # Filter the date range once and let every aggregate run against the
+    # same subquery instead of repeating the range scan per metric
+    filtered = db.query(
+        models.SMSRecord.id.label('id'),
+        models.SMSRecord.transaction_type.label('transaction_type'),
+        models.SMSRecord.amount.label('amount'),
+        models.SMSRecord.transaction_date.label('transaction_date'),
+        models.SMSRecord.sender_name.label('sender_name'),
+        models.SMSRecord.receiver_name.label('receiver_name')
+    ).filter(
         models.SMSRecord.transaction_date.between(start_date, end_date)
-    ).scalar() or 0
-    
-    # Total amount
-    total_amount_result = db.query(func.sum(models.SMSRecord.amount)).filter(
-        and_(
-            models.SMSRecord.transaction_date.between(start_date, end_date),
-            models.SMSRecord.amount.isnot(None)
-        )
-    ).scalar()
-    total_amount = total_amount_result or Decimal('0.0')
-    
+    ).subquery()
+
+    # Totals in a single round-trip (count + sum together). Aggregate as
+    # plain floats: SQLite stores REAL anyway, and Decimal coercion per
+    # value is pure overhead on this read-only path.
+    total_txns, total_amount = db.query(
+        func.count(filtered.c.id),
+        func.coalesce(func.sum(filtered.c.amount), 0.0)
+    ).one()
+
     # Average transaction
-    avg_txn = total_amount / total_txns if total_txns > 0 else Decimal('0.0')
-    
+    avg_txn = total_amount / total_txns if total_txns > 0 else 0.0
+
     # Transaction counts by type
     type_counts = db.query(
-        models.SMSRecord.transaction_type,
-        func.count(models.SMSRecord.id).label('count')
-    ).filter(
-        models.SMSRecord.transaction_date.between(start_date, end_date)
-    ).group_by(models.SMSRecord.transaction_type).all()
-    
+        filtered.c.transaction_type,
+        func.count(filtered.c.id).label('count')
+    ).group_by(filtered.c.transaction_type).all()
+
     transaction_counts = {str(t[0]): t[1] for t in type_counts if t[0]}
-    
+
     # Daily volume
     daily_volume = db.query(
-        func.date(models.SMSRecord.transaction_date).label('date'),
-        func.count(models.SMSRecord.id).label('count'),
-        func.sum(models.SMSRecord.amount).label('total')
-    ).filter(
-        models.SMSRecord.transaction_date.between(start_date, end_date)
-    ).group_by(func.date(models.SMSRecord.transaction_date)).order_by('date').all()
-    
+        func.date(filtered.c.transaction_date).label('date'),
+        func.count(filtered.c.id).label('count'),
+        func.coalesce(func.sum(filtered.c.amount), 0.0).label('total')
+    ).group_by(func.date(filtered.c.transaction_date)).order_by('date').all()
+
     # Top senders
     top_senders = db.query(
-        models.SMSRecord.sender_name,
-        func.count(models.SMSRecord.id).label('txn_count'),
-        func.sum(models.SMSRecord.amount).label('total_sent')
+        filtered.c.sender_name,
+        func.count(filtered.c.id).label('txn_count'),
+        func.coalesce(func.sum(filtered.c.amount), 0.0).label('total_sent')
     ).filter(
-        and_(
-            models.SMSRecord.transaction_date.between(start_date, end_date),
-            models.SMSRecord.sender_name.isnot(None)
-        )
-    ).group_by(models.SMSRecord.sender_name).order_by(desc('total_sent')).limit(10).all()
-    
+        filtered.c.sender_name.isnot(None)
+    ).group_by(filtered.c.sender_name).order_by(desc('total_sent')).limit(10).all()
+
     # Top receivers
     top_receivers = db.query(
-        models.SMSRecord.receiver_name,
-        func.count(models.SMSRecord.id).label('txn_count'),
-        func.sum(models.SMSRecord.amount).label('total_received')
+        filtered.c.receiver_name,
+        func.count(filtered.c.id).label('txn_count'),
+        func.coalesce(func.sum(filtered.c.amount), 0.0).label('total_received')
     ).filter(
-        and_(
-            models.SMSRecord.transaction_date.between(start_date, end_date),
-            models.SMSRecord.receiver_name.isnot(None)
-        )
-    ).group_by(models.SMSRecord.receiver_name).order_by(desc('total_received')).limit(10).all()
+        filtered.c.receiver_name.isnot(None)
+    ).group_by(filtered.c.receiver_name).order_by(desc('total_received')).limit(10).all()
     
     return {
         "total_transactions": total_txns,
@@ -306,21 +505,21 @@ def get_dashboard_stats(db: Session, days: int = 30):
             {
                 "date": str(dv[0]),
                 "count": dv[1],
-                "total": dv[2] or Decimal('0.0')
+                "total": dv[2]
             } for dv in daily_volume
         ],
         "top_senders": [
             {
                 "name": ts[0],
                 "transaction_count": ts[1],
-                "total_sent": ts[2] or Decimal('0.0')
+                "total_sent": ts[2]
             } for ts in top_senders
         ],
         "top_receivers": [
             {
                 "name": tr[0],
                 "transaction_count": tr[1],
-                "total_received": tr[2] or Decimal('0.0')
+                "total_received": tr[2]
             } for tr in top_receivers
         ]
     }
@@ -378,7 +577,6 @@ def create_otp(db: Session, otp: schemas.OTPRecordCreate):
     )
     db.add(db_otp)
     db.commit()
-    db.refresh(db_otp)
     return db_otp
 
 def validate_otp(db: Session, otp_code: str, phone_number: str):
@@ -3,14 +3,16 @@ Database configuration and connection management
 Team Eight: James Giir Deng & Byusa M Martin De Poles
 """
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, insert, select, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import QueuePool
 from sqlalchemy.event import listens_for
 from sqlalchemy.engine import Engine
 from contextlib import contextmanager
+from prometheus_client import Counter, Gauge
 import logging
+import orjson
 from typing import Generator
 import time
 
@@ -30,20 +32,47 @@ engine_kwargs = {
     "pool_timeout": 30,
     "pool_recycle": 3600,
     "pool_pre_ping": True,
+    # Batch size for the insertmanyvalues bulk path (SMSRecord.bulk_insert)
+    "insertmanyvalues_page_size": 10_000,
+    # Compiled-statement cache sized above the default 500: the API's
+    # working set of distinct statements (CRUD variants x filters) should
+    # stay resident so repeated requests skip SQL compilation entirely
+    "query_cache_size": 1200,
+    # orjson for every JSON column (tags, metadata, cache_data,
+    # query_params, notification_preferences): C-backed parse/serialize
+    # instead of the stdlib tokenizer — DashboardCache.cache_data blobs
+    # are read on every cache hit
+    "json_serializer": lambda value: orjson.dumps(value).decode("utf-8"),
+    "json_deserializer": orjson.loads,
 }
 
 # SQLite specific configuration
 if DATABASE_URL.startswith("sqlite"):
     engine_kwargs["connect_args"] = {"check_same_thread": False}
     engine_kwargs["poolclass"] = None  # SQLite doesn't need connection pooling
+    # No network between us and the file — a pre-checkout ping is a
+    # wasted round trip per request
+    engine_kwargs["pool_pre_ping"] = False
 # MySQL specific configuration
 elif "mysql" in DATABASE_URL:
     engine_kwargs["pool_pre_ping"] = True
     engine_kwargs["pool_recycle"] = 299
+    # LIFO hands out the most recently returned connection, keeping the
+    # working set hot (server-side caches, fewer stale connections)
+    engine_kwargs["pool_use_lifo"] = True
 # PostgreSQL specific configuration
 elif "postgresql" in DATABASE_URL:
     engine_kwargs["pool_size"] = 20
     engine_kwargs["max_overflow"] = 40
+    engine_kwargs["pool_use_lifo"] = True
+    # With LIFO the top-of-stack connection is almost always fresh, so
+    # age-based recycling does most of the liveness work and the
+    # pre-ping rarely finds anything
+    engine_kwargs["pool_recycle"] = 1800
+    # psycopg2 fast executemany: batch multi-row VALUES pages instead of
+    # one round trip per row on the SMSRecord.bulk_insert path
+    engine_kwargs["executemany_mode"] = "values_plus_batch"
+    engine_kwargs["executemany_values_page_size"] = 10_000
 
 # Create SQLAlchemy engine
 engine = create_engine(DATABASE_URL, **engine_kwargs)
@@ -58,17 +87,31 @@ SessionLocal = sessionmaker(
 
 Base = declarative_base()
 
-# Add query logging for debugging
-@listens_for(Engine, "before_cursor_execute")
-def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
-    conn.info.setdefault('query_start_time', []).append(time.time())
-    logger.debug(f"Starting query: {statement}")
+# Slow-query logging. Only register the listeners when WARNING is
+# enabled at all, so production runs with logging off pay nothing per
+# query; the fast path inside keeps to a time.time() and one compare,
+# with the statement text only interpolated when the threshold trips.
+SLOW_QUERY_THRESHOLD = 0.1  # seconds — anything slower is an N+1 or a missing index
 
-@listens_for(Engine, "after_cursor_execute")
-def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
-    total = time.time() - conn.info['query_start_time'].pop(-1)
-    if total > 0.5:  # Log slow queries (more than 500ms)
-        logger.warning(f"Slow query ({total:.3f}s): {statement}")
+# Module-scope text() constructs: built and cached once, so frequent
+# pings (healthchecks fire every few seconds) hit the compiled-statement
+# cache instead of re-parsing a raw string. SQLAlchemy 2.x also rejects
+# plain strings passed to execute().
+PING = text("SELECT 1")
+PAGE_COUNT = text("PRAGMA page_count")
+PAGE_SIZE = text("PRAGMA page_size")
+
+if logger.isEnabledFor(logging.WARNING):
+    @listens_for(Engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+    @listens_for(Engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        total = time.perf_counter() - conn.info['query_start_time'].pop(-1)
+        if total > SLOW_QUERY_THRESHOLD:
+            # Truncate: a bulk INSERT statement can run to megabytes
+            logger.warning("Slow query (%.3fs): %s", total, statement[:500])
 
 def get_db() -> Generator:
     """
@@ -122,13 +165,21 @@ def init_db():
         # Import all models here to ensure they are registered
         from . import models
         Base.metadata.create_all(bind=engine)
-        
-        # Create default transaction categories
+
+        # Full-text index for /api/search. FTS5 turns the 4-column
+        # LIKE '%term%' scan into an inverted-index lookup; triggers keep
+        # it in sync with sms_records.
+        if DATABASE_URL.startswith("sqlite"):
+            try:
+                _create_fts_index()
+            except Exception as e:
+                logger.warning(f"FTS index unavailable, search falls back to LIKE: {e}")
+
+        # Seed default categories and record the startup event in one
+        # session: one pool checkout, one commit, one fsync on SQLite
         with db_session() as db:
-            # Check if categories already exist
-            from .crud import get_category_by_code
-            from .models import TransactionCategory
-            
+            from .models import TransactionCategory, SystemLog
+
             default_categories = [
                 {"name": "Money Transfer", "code": "TRANSFER", "description": "Transfer of funds to another user"},
                 {"name": "Bank Deposit", "code": "DEPOSIT", "description": "Deposit from bank to mobile money"},
@@ -142,31 +193,76 @@ def init_db():
                 {"name": "Commission", "code": "COMM", "description": "Agent commission"},
             ]
             
-            for cat_data in default_categories:
-                existing = get_category_by_code(db, cat_data["code"])
-                if not existing:
-                    category = TransactionCategory(**cat_data)
-                    db.add(category)
-            
-            db.commit()
-        
-        logger.info("✅ Database initialized successfully!")
-        
-        # Log system event
-        with db_session() as db:
-            from .models import SystemLog
-            log = SystemLog(
+            # One SELECT for the codes already present, one bulk INSERT
+            # for the missing rows, instead of a SELECT + add per category
+            existing_codes = {
+                code for (code,) in db.execute(
+                    select(TransactionCategory.code).where(
+                        TransactionCategory.code.in_([c["code"] for c in default_categories])
+                    )
+                )
+            }
+            missing = [
+                cat_data for cat_data in default_categories
+                if cat_data["code"] not in existing_codes
+            ]
+            if missing:
+                # Core insert + list of dicts compiles to one executemany
+                # (a multi-row VALUES on backends that support it) instead
+                # of a unit-of-work INSERT per object. parse_xml follows
+                # the same pattern for bulk SMS loads.
+                db.execute(insert(TransactionCategory), missing)
+
+            # Log system event; db_session commits both on exit
+            db.add(SystemLog(
                 level="INFO",
                 module="Database",
                 message="Database initialized successfully",
                 details=f"Database URL: {DATABASE_URL}"
-            )
-            db.add(log)
-        
+            ))
+
+        logger.info("✅ Database initialized successfully!")
+
     except Exception as e:
         logger.error(f"❌ Database initialization failed: {e}")
         raise
 
+def _create_fts_index():
+    """Create the FTS5 table and sync triggers for sms_records (SQLite only)"""
+    fts_columns = "body, sender_name, receiver_name, transaction_id"
+    statements = [
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS sms_fts USING fts5(
+            {fts_columns},
+            content='sms_records', content_rowid='id'
+        )
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS sms_fts_ai AFTER INSERT ON sms_records BEGIN
+            INSERT INTO sms_fts(rowid, {fts_columns})
+            VALUES (new.id, new.body, new.sender_name, new.receiver_name, new.transaction_id);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS sms_fts_ad AFTER DELETE ON sms_records BEGIN
+            INSERT INTO sms_fts(sms_fts, rowid, {fts_columns})
+            VALUES ('delete', old.id, old.body, old.sender_name, old.receiver_name, old.transaction_id);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS sms_fts_au AFTER UPDATE ON sms_records BEGIN
+            INSERT INTO sms_fts(sms_fts, rowid, {fts_columns})
+            VALUES ('delete', old.id, old.body, old.sender_name, old.receiver_name, old.transaction_id);
+            INSERT INTO sms_fts(rowid, {fts_columns})
+            VALUES (new.id, new.body, new.sender_name, new.receiver_name, new.transaction_id);
+        END
+        """,
+    ]
+    with engine.connect() as conn:
+        for stmt in statements:
+            conn.exec_driver_sql(stmt)
+        conn.commit()
+
 def check_database_connection() -> bool:
     """
     Check if database connection is working.
@@ -176,7 +272,7 @@ def check_database_connection() -> bool:
     """
     try:
         with engine.connect() as conn:
-            conn.execute("SELECT 1")
+            conn.execute(PING)
         logger.info("✅ Database connection successful")
         return True
     except Exception as e:
@@ -193,26 +289,30 @@ def get_database_stats() -> dict:
     stats = {}
     try:
         with db_session() as db:
-            from . import models
-            
-            # Get count for each table
             tables = [
-                ("users", models.User),
-                ("sms_records", models.SMSRecord),
-                ("transaction_categories", models.TransactionCategory),
-                ("system_logs", models.SystemLog),
-                ("otp_records", models.OTPRecord),
+                "users",
+                "sms_records",
+                "transaction_categories",
+                "system_logs",
+                "otp_records",
             ]
-            
-            for table_name, model in tables:
-                count = db.query(model).count()
-                stats[table_name] = count
-            
+
+            # One UNION ALL round trip of flat SELECT count(*) per table,
+            # instead of five ORM .count() calls that each wrap the table
+            # in a subquery
+            count_sql = " UNION ALL ".join(
+                f"SELECT '{name}' AS table_name, (SELECT count(*) FROM {name}) AS row_count"
+                for name in tables
+            )
+            for table_name, row_count in db.execute(text(count_sql)):
+                stats[table_name] = row_count
+
             # Get database size (for supported databases)
             if "sqlite" in DATABASE_URL:
-                result = db.execute("SELECT page_count * page_size as size FROM pragma_page_count(), pragma_page_size()").fetchone()
-                if result:
-                    stats["database_size_bytes"] = result[0]
+                page_count = db.execute(PAGE_COUNT).scalar()
+                page_size = db.execute(PAGE_SIZE).scalar()
+                if page_count is not None and page_size is not None:
+                    stats["database_size_bytes"] = page_count * page_size
             
             stats["connection_status"] = "connected"
             stats["database_url"] = DATABASE_URL.split('@')[-1] if '@' in DATABASE_URL else DATABASE_URL
@@ -224,42 +324,29 @@ def get_database_stats() -> dict:
     
     return stats
 
-# Create database connection pool metrics
-class DatabaseMetrics:
-    """Track database connection metrics"""
-    
-    def __init__(self):
-        self.connections_checked_out = 0
-        self.connections_returned = 0
-        self.connection_errors = 0
-    
-    def increment_checked_out(self):
-        self.connections_checked_out += 1
-    
-    def increment_returned(self):
-        self.connections_returned += 1
-    
-    def increment_errors(self):
-        self.connection_errors += 1
-    
-    def get_metrics(self) -> dict:
-        return {
-            "connections_checked_out": self.connections_checked_out,
-            "connections_returned": self.connections_returned,
-            "connection_errors": self.connection_errors,
-            "active_connections": self.connections_checked_out - self.connections_returned,
-        }
-
-# Global metrics instance
-db_metrics = DatabaseMetrics()
+# Connection pool metrics. prometheus_client counters/gauges increment
+# under their own lock, so the checkout/checkin listeners are safe
+# across threads (the old plain-int DatabaseMetrics was not, and its
+# logger.debug calls ran on every connection event).
+CONNECTIONS_CHECKED_OUT = Counter(
+    "db_connections_checked_out_total",
+    "Total database connections checked out of the pool",
+)
+CONNECTIONS_RETURNED = Counter(
+    "db_connections_returned_total",
+    "Total database connections returned to the pool",
+)
+ACTIVE_CONNECTIONS = Gauge(
+    "db_active_connections",
+    "Database connections currently checked out",
+)
 
-# Listen for connection events
 @listens_for(engine, "checkout")
 def checkout_listener(dbapi_con, con_record, con_proxy):
-    db_metrics.increment_checked_out()
-    logger.debug("Database connection checked out")
+    CONNECTIONS_CHECKED_OUT.inc()
+    ACTIVE_CONNECTIONS.inc()
 
 @listens_for(engine, "checkin")
 def checkin_listener(dbapi_con, con_record):
-    db_metrics.increment_returned()
-    logger.debug("Database connection checked in")
\ No newline at end of file
+    CONNECTIONS_RETURNED.inc()
+    ACTIVE_CONNECTIONS.dec()
\ No newline at end of file
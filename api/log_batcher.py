@@ -0,0 +1,97 @@
+"""
+Batched access logging for the API
+Team Eight: James Giir Deng & Byusa M Martin De Poles
+"""
+import asyncio
+import logging
+
+from sqlalchemy import insert
+
+from . import models
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Flush whenever either bound is hit: the buffer never holds more than
+# FLUSH_THRESHOLD rows and an entry never waits longer than
+# FLUSH_INTERVAL seconds
+FLUSH_INTERVAL = 5.0
+FLUSH_THRESHOLD = 100
+
+
+class BatchedLogger:
+    """Accumulates APIAccessLog rows and flushes them in batches.
+
+    Writing one access-log row synchronously per request costs a
+    round trip and a commit on the hot path. Handlers instead call
+    log_access() (a queue put, no I/O); a background task drains the
+    queue and writes up to FLUSH_THRESHOLD rows with a single
+    multi-row INSERT — O(1) commits per batch instead of per request.
+    """
+
+    def __init__(self, flush_interval=FLUSH_INTERVAL,
+                 flush_threshold=FLUSH_THRESHOLD):
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    def log_access(self, entry: dict):
+        """Enqueue one access-log row; never blocks the request path"""
+        self._queue.put_nowait(entry)
+
+    async def start(self):
+        """Start the background flush task (call from app startup)"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._worker())
+
+    async def stop(self):
+        """Cancel the worker and drain whatever is still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        remaining = self._drain()
+        if remaining:
+            await asyncio.to_thread(self._flush, remaining)
+
+    def _drain(self):
+        rows = []
+        while not self._queue.empty():
+            rows.append(self._queue.get_nowait())
+        return rows
+
+    async def _worker(self):
+        buffer = []
+        while True:
+            try:
+                entry = await asyncio.wait_for(
+                    self._queue.get(), timeout=self.flush_interval
+                )
+            except asyncio.TimeoutError:
+                if buffer:
+                    await asyncio.to_thread(self._flush, buffer)
+                    buffer = []
+                continue
+
+            buffer.append(entry)
+            if len(buffer) >= self.flush_threshold:
+                await asyncio.to_thread(self._flush, buffer)
+                buffer = []
+
+    def _flush(self, rows):
+        """One Core multi-row INSERT for the whole batch (runs in a thread)"""
+        try:
+            with SessionLocal() as db:
+                db.execute(insert(models.APIAccessLog), rows)
+                db.commit()
+        except Exception as e:
+            # Logging must never take the API down; drop the batch
+            logger.error(f"Failed to flush {len(rows)} access-log rows: {e}")
+
+
+# Process-local singleton used by the access-log middleware
+batcher = BatchedLogger()
@@ -0,0 +1,144 @@
+"""
+Background dashboard metric refresher
+Team Eight: James Giir Deng & Byusa M Martin De Poles
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, insert, select
+
+from . import crud, models
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Recompute every minute; entries stay valid for two refresh periods so
+# a slow or failed refresh never leaves readers with nothing
+REFRESH_INTERVAL = 60.0
+CACHE_TTL_SECONDS = 120
+STATS_WINDOWS = (7, 30, 90)  # days precomputed for the dashboard
+
+
+def cache_key_for(days: int) -> str:
+    return f"dashboard_stats_{days}d"
+
+
+def get_cached_stats(db, days: int):
+    """Single indexed lookup of a precomputed dashboard payload.
+
+    Returns the cached stats dict, or None when the window is not
+    precomputed or the entry has expired — callers fall back to
+    computing on demand.
+    """
+    return db.execute(
+        select(models.DashboardCache.cache_data)
+        .where(
+            models.DashboardCache.cache_key == cache_key_for(days),
+            models.DashboardCache.expires_at > datetime.now(),
+        )
+        .limit(1)
+    ).scalar()
+
+
+def refresh_dashboard_cache(days: int):
+    """Recompute one window's stats and upsert its cache row"""
+    with SessionLocal() as db:
+        stats = crud.get_dashboard_stats(db, days=days)
+        expires_at = datetime.now() + timedelta(seconds=CACHE_TTL_SECONDS)
+
+        entry = db.query(models.DashboardCache).filter(
+            models.DashboardCache.cache_key == cache_key_for(days)
+        ).one_or_none()
+        if entry is not None:
+            entry.cache_data = stats
+            entry.expires_at = expires_at
+        else:
+            db.add(models.DashboardCache(
+                cache_key=cache_key_for(days),
+                cache_data=stats,
+                cache_type="stats",
+                expires_at=expires_at,
+            ))
+        db.commit()
+
+
+def refresh_monthly_rollup():
+    """Rebuild sms_monthly_rollup with one aggregate INSERT...SELECT.
+
+    A full rebuild per cycle is deliberate: the Core bulk-ingest path
+    does not fire ORM insert events, so incremental counters would
+    silently drift. The aggregate groups the table once and the
+    transactional delete+insert swaps the contents atomically.
+    """
+    year = func.extract('year', models.SMSRecord.transaction_date)
+    month = func.extract('month', models.SMSRecord.transaction_date)
+    aggregate = (
+        select(
+            year.label('year'),
+            month.label('month'),
+            models.SMSRecord.transaction_type,
+            func.count().label('transaction_count'),
+            func.coalesce(func.sum(models.SMSRecord.amount), 0).label('total_amount'),
+        )
+        .where(
+            models.SMSRecord.transaction_date.isnot(None),
+            models.SMSRecord.transaction_type.isnot(None),
+        )
+        .group_by(year, month, models.SMSRecord.transaction_type)
+    )
+    with SessionLocal() as db:
+        db.execute(delete(models.SMSMonthlyRollup))
+        db.execute(
+            insert(models.SMSMonthlyRollup).from_select(
+                ['year', 'month', 'transaction_type',
+                 'transaction_count', 'total_amount'],
+                aggregate,
+            )
+        )
+        db.commit()
+
+
+class MetricRefresher:
+    """Periodically materializes dashboard aggregates into DashboardCache.
+
+    The aggregation over sms_records is the most expensive read in the
+    app; running it on a timer moves that cost off the request path, so
+    handlers serve the dashboard with one indexed SELECT on cache_key.
+    Same start/stop lifecycle as log_batcher.BatchedLogger.
+    """
+
+    def __init__(self, interval=REFRESH_INTERVAL, windows=STATS_WINDOWS):
+        self.interval = interval
+        self.windows = windows
+        self._task = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._worker())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _worker(self):
+        while True:
+            for days in self.windows:
+                try:
+                    await asyncio.to_thread(refresh_dashboard_cache, days)
+                except Exception as e:
+                    logger.error(f"Dashboard refresh failed for {days}d: {e}")
+            try:
+                await asyncio.to_thread(refresh_monthly_rollup)
+            except Exception as e:
+                logger.error(f"Monthly rollup refresh failed: {e}")
+            await asyncio.sleep(self.interval)
+
+
+# Process-local singleton started from app startup
+refresher = MetricRefresher()
@@ -4,15 +4,28 @@ Team Eight: James Giir Deng & Byusa M Martin De Poles
 """
 from sqlalchemy import (
     Column, Integer, String, DateTime, Float, Boolean, Text, 
-    ForeignKey, Enum, DECIMAL, CheckConstraint, Index, 
-    JSON, LargeBinary, func, UniqueConstraint, text
+    ForeignKey, Enum, DECIMAL, BigInteger, SmallInteger, CheckConstraint,
+    Index, JSON, LargeBinary, func, UniqueConstraint, text, select, insert,
+    delete, inspect, and_
 )
-from sqlalchemy.orm import relationship, validates
+from sqlalchemy.types import TypeDecorator
+from sqlalchemy.orm import relationship, backref, validates, object_session, deferred
 from sqlalchemy.sql import expression
 from sqlalchemy.ext.hybrid import hybrid_property, hybrid_method
 from sqlalchemy.dialects.mysql import ENUM as MySQLEnum
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from datetime import datetime, timezone
+from operator import attrgetter
+import dataclasses
 import enum
+import hashlib
+import os
+import time
+import uuid as uuid_lib
+import zlib
+import functools
 import re
 import logging
 from typing import Optional, List
@@ -22,6 +35,55 @@ from .database import Base
 
 logger = logging.getLogger(__name__)
 
+def hash_api_key(api_key: str) -> bytes:
+    """16-byte blake2b digest of an API key for indexed lookups"""
+    return hashlib.blake2b(api_key.encode("utf-8"), digest_size=16).digest()
+
+# Request/response bodies logged by APIAccessLog are capped before they
+# ever cross the wire to the database
+BODY_TRUNCATE_BYTES = 8192
+
+def compress_body(body: Optional[str]) -> Optional[bytes]:
+    """Truncate a logged HTTP body to 8KB and zlib-compress it"""
+    if body is None:
+        return None
+    return zlib.compress(body.encode("utf-8")[:BODY_TRUNCATE_BYTES])
+
+def decompress_body(blob: Optional[bytes]) -> Optional[str]:
+    """Inverse of compress_body; invalid UTF-8 at the cut is dropped"""
+    if blob is None:
+        return None
+    return zlib.decompress(blob).decode("utf-8", errors="ignore")
+
+def generate_uuid7() -> str:
+    """Generate a time-ordered UUIDv7 string (RFC 9562).
+
+    Client-side generation replaces the MySQL-only UUID() server
+    default (which SQLite lacks entirely), and the millisecond
+    timestamp prefix keeps the unique index on uuid columns
+    append-friendly instead of fragmenting on random values.
+    """
+    timestamp_ms = int(time.time() * 1000) & ((1 << 48) - 1)
+    rand_a = int.from_bytes(os.urandom(2), "big") & 0x0FFF
+    rand_b = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    value = (timestamp_ms << 80) | (0x7 << 76) | (rand_a << 64) | (0x2 << 62) | rand_b
+    return str(uuid_lib.UUID(int=value))
+
+
+# Validator patterns compiled once at import: at bulk-ingest rates the
+# per-call re cache probe inside re.match() is measurable overhead
+PHONE_RE = re.compile(r'^\+?\d{10,15}$')
+EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+CODE_RE = re.compile(r'^[A-Z_]{2,10}$')
+COLOR_RE = re.compile(r'^#[0-9A-Fa-f]{6}$')
+OTP_CODE_RE = re.compile(r'^[0-9]{4,10}$')
+
+
+@functools.lru_cache(maxsize=128)
+def _compile_pattern(pattern):
+    """Compile a user-supplied pattern once and reuse it"""
+    return re.compile(pattern)
+
 class TransactionType(enum.Enum):
     """Enumeration of possible transaction types"""
     RECEIVED = "received"
@@ -37,6 +99,58 @@ class TransactionType(enum.Enum):
     SALARY = "salary"
     UNKNOWN = "unknown"
 
+# Direction sets built once — the hybrids below check membership against
+# these instead of allocating a list per access
+INCOMING_TYPES = frozenset({
+    TransactionType.RECEIVED,
+    TransactionType.DEPOSIT,
+    TransactionType.REFUND,
+    TransactionType.SALARY,
+})
+OUTGOING_TYPES = frozenset({
+    TransactionType.SENT,
+    TransactionType.WITHDRAWAL,
+    TransactionType.PAYMENT,
+    TransactionType.AIRTIME,
+    TransactionType.BILL_PAYMENT,
+    TransactionType.CASH_POWER,
+    TransactionType.COMMISSION,
+})
+
+# All members as a frozenset — set membership instead of the slower
+# EnumMeta.__contains__ on the per-row validation path
+_VALID_TX_TYPES = frozenset(TransactionType)
+
+
+class TransactionTypeCode(TypeDecorator):
+    """Stores TransactionType as a SMALLINT code.
+
+    The stock Enum() column stored the member name as a string —
+    ~10 bytes per row plus the same again in every index entry
+    (idx_transaction_date_type, idx_amount_type, ...). A 2-byte code
+    keeps the Python-facing attribute a TransactionType member while
+    narrowing the hot table and its composite indexes. Codes are part
+    of the storage format: never renumber, only append.
+    """
+    impl = SmallInteger
+    cache_ok = True
+
+    _to_code = {member: code for code, member in enumerate(TransactionType, 1)}
+    _from_code = {code: member for member, code in _to_code.items()}
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            value = TransactionType(value)
+        return self._to_code[value]
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return self._from_code[value]
+
+
 class LogLevel(enum.Enum):
     """Enumeration of log levels"""
     DEBUG = "DEBUG"
@@ -45,10 +159,61 @@ class LogLevel(enum.Enum):
     ERROR = "ERROR"
     CRITICAL = "CRITICAL"
 
+
+class LogLevelCode(TypeDecorator):
+    """Stores LogLevel as a SMALLINT code (see TransactionTypeCode)"""
+    impl = SmallInteger
+    cache_ok = True
+
+    _to_code = {member: code for code, member in enumerate(LogLevel, 1)}
+    _from_code = {code: member for member, code in _to_code.items()}
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            value = LogLevel(value.upper())
+        return self._to_code[value]
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return self._from_code[value]
+
+# Serialization field tuples for the to_dict methods below. One
+# attrgetter call fetches every plain column, and dict(zip(...)) builds
+# the row dict without the ~20 attribute loads and truthiness branches
+# of a dict literal — measurably cheaper when list endpoints render
+# thousands of rows. Datetime keys are post-processed in a short loop.
+_USER_FIELDS = (
+    'id', 'uuid', 'phone_number', 'email', 'full_name', 'account_number',
+    'account_type', 'is_active', 'is_verified', 'created_at', 'updated_at',
+)
+_USER_GET = attrgetter(*_USER_FIELDS)
+_USER_DATETIME_FIELDS = ('created_at', 'updated_at')
+
+_SMS_FIELDS = (
+    'id', 'uuid', 'address', 'body', 'date', 'readable_date',
+    'transaction_type', 'amount', 'currency', 'fee', 'balance_after',
+    'transaction_id', 'transaction_date', 'sender_name', 'receiver_name',
+    'sender_phone', 'receiver_phone', 'is_parsed', 'is_valid',
+    'confidence_score', 'created_at', 'updated_at',
+)
+_SMS_GET = attrgetter(*_SMS_FIELDS)
+_SMS_DATETIME_FIELDS = ('date', 'transaction_date', 'created_at', 'updated_at')
+
+_CATEGORY_FIELDS = (
+    'id', 'uuid', 'name', 'description', 'code', 'level', 'path',
+    'is_active', 'icon', 'color', 'created_at', 'updated_at',
+)
+_CATEGORY_GET = attrgetter(*_CATEGORY_FIELDS)
+_CATEGORY_DATETIME_FIELDS = ('created_at', 'updated_at')
+
+
 class User(Base):
     """
     User entity representing customers, senders, and receivers
-    
+
     Stores user information for transaction tracking and analytics
     """
     __tablename__ = "users"
@@ -57,7 +222,7 @@ class User(Base):
     id = Column(Integer, primary_key=True, index=True, autoincrement=True,
                 comment="Unique identifier for the user")
     uuid = Column(String(36), unique=True, index=True, nullable=False,
-                  server_default=text("UUID()"),
+                  default=generate_uuid7,
                   comment="Universally unique identifier for the user")
     
     # Contact information
@@ -95,8 +260,11 @@ class User(Base):
                       comment="User's preferred language")
     timezone = Column(String(50), default="UTC",
                       comment="User's timezone")
-    notification_preferences = Column(JSON, default=dict,
-                                      comment="User's notification preferences")
+    # Deferred: only the settings endpoints read this JSON blob, list
+    # queries shouldn't pay to deserialize it per row
+    notification_preferences = deferred(
+        Column(JSON, default=dict,
+               comment="User's notification preferences"))
     
     # Metadata
     created_at = Column(DateTime(timezone=True), 
@@ -111,25 +279,27 @@ class User(Base):
     deleted_at = Column(DateTime(timezone=True), nullable=True,
                         comment="Soft delete timestamp")
     
-    # Relationships
+    # Relationships. Default lazy="select" collections rather than
+    # lazy="dynamic": dynamic forbids selectinload/subqueryload at query
+    # sites and issues a fresh query per access, and the aggregate
+    # consumers that used to iterate these now run SQL-side COUNT/SUM.
+    # Filtered access goes through query_sent_transactions/
+    # query_received_transactions below.
     sent_transactions = relationship(
-        "SMSRecord", 
-        foreign_keys="SMSRecord.sender_id", 
+        "SMSRecord",
+        foreign_keys="SMSRecord.sender_id",
         back_populates="sender",
-        lazy="dynamic",
         cascade="all, delete-orphan"
     )
     received_transactions = relationship(
-        "SMSRecord", 
-        foreign_keys="SMSRecord.receiver_id", 
+        "SMSRecord",
+        foreign_keys="SMSRecord.receiver_id",
         back_populates="receiver",
-        lazy="dynamic",
         cascade="all, delete-orphan"
     )
     logs = relationship(
         "SystemLog",
         back_populates="user",
-        lazy="dynamic",
         cascade="all, delete-orphan"
     )
     
@@ -153,11 +323,15 @@ class User(Base):
         # Comment
         {'comment': 'Stores user information for senders and receivers'},
     )
-    
+
+    # Return server-generated defaults (uuid, timestamps) with the
+    # INSERT itself so creates don't need a follow-up refresh SELECT
+    __mapper_args__ = {"eager_defaults": True}
+
     @validates('phone_number')
     def validate_phone_number(self, key, phone_number):
         """Validate phone number format"""
-        if not re.match(r'^\+?\d{10,15}$', phone_number):
+        if not PHONE_RE.match(phone_number):
             raise ValueError("Invalid phone number format")
         return phone_number
     
@@ -165,56 +339,143 @@ class User(Base):
     def validate_email(self, key, email):
         """Validate email format if provided"""
         if email is not None:
-            if not re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', email):
+            if not EMAIL_RE.match(email):
                 raise ValueError("Invalid email format")
         return email
     
+    # Aggregate hybrids are computed in SQL: a one-row COUNT/SUM instead
+    # of materializing every related SMSRecord and summing in Python.
+    # The .expression forms let queries filter and order on them too.
     @hybrid_property
     def total_transactions(self):
         """Calculate total number of transactions for this user"""
-        return len(self.sent_transactions.all()) + len(self.received_transactions.all())
-    
+        return object_session(self).execute(
+            select(
+                select(func.count()).where(SMSRecord.sender_id == self.id).scalar_subquery()
+                + select(func.count()).where(SMSRecord.receiver_id == self.id).scalar_subquery()
+            )
+        ).scalar()
+
+    @total_transactions.expression
+    def total_transactions(cls):
+        return (
+            select(func.count()).where(SMSRecord.sender_id == cls.id).scalar_subquery()
+            + select(func.count()).where(SMSRecord.receiver_id == cls.id).scalar_subquery()
+        )
+
     @hybrid_property
     def total_sent(self):
         """Calculate total amount sent by this user"""
-        sent_amounts = [t.amount or 0 for t in self.sent_transactions.all()]
-        return sum(sent_amounts)
-    
+        return object_session(self).execute(
+            select(func.coalesce(func.sum(SMSRecord.amount), 0)).where(
+                SMSRecord.sender_id == self.id
+            )
+        ).scalar()
+
+    @total_sent.expression
+    def total_sent(cls):
+        return select(func.coalesce(func.sum(SMSRecord.amount), 0)).where(
+            SMSRecord.sender_id == cls.id
+        ).scalar_subquery()
+
     @hybrid_property
     def total_received(self):
         """Calculate total amount received by this user"""
-        received_amounts = [t.amount or 0 for t in self.received_transactions.all()]
-        return sum(received_amounts)
-    
+        return object_session(self).execute(
+            select(func.coalesce(func.sum(SMSRecord.amount), 0)).where(
+                SMSRecord.receiver_id == self.id
+            )
+        ).scalar()
+
+    @total_received.expression
+    def total_received(cls):
+        return select(func.coalesce(func.sum(SMSRecord.amount), 0)).where(
+            SMSRecord.receiver_id == cls.id
+        ).scalar_subquery()
+
     @hybrid_property
     def net_flow(self):
         """Calculate net flow (received - sent)"""
         return self.total_received - self.total_sent
-    
-    def to_dict(self):
-        """Convert user object to dictionary"""
-        return {
-            'id': self.id,
-            'uuid': self.uuid,
-            'phone_number': self.phone_number,
-            'email': self.email,
-            'full_name': self.full_name,
-            'account_number': self.account_number,
-            'account_type': self.account_type,
-            'is_active': self.is_active,
-            'is_verified': self.is_verified,
-            'total_transactions': self.total_transactions,
-            'total_sent': float(self.total_sent) if self.total_sent else 0,
-            'total_received': float(self.total_received) if self.total_received else 0,
-            'net_flow': float(self.net_flow) if self.net_flow else 0,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-        }
+
+    @net_flow.expression
+    def net_flow(cls):
+        return cls.total_received - cls.total_sent
+
+    @classmethod
+    def bulk_totals(cls, session, user_ids):
+        """Aggregate sent/received totals for many users at once.
+
+        Returns {user_id: (total_sent, total_received)} from two grouped
+        queries. List endpoints should call this once and pass the
+        results into to_dict(stats=...) instead of letting each user's
+        hybrids run their own aggregate query per row.
+        """
+        totals = {uid: [0, 0] for uid in user_ids}
+        sent_rows = session.execute(
+            select(SMSRecord.sender_id, func.coalesce(func.sum(SMSRecord.amount), 0))
+            .where(SMSRecord.sender_id.in_(user_ids))
+            .group_by(SMSRecord.sender_id)
+        )
+        for uid, total in sent_rows:
+            totals[uid][0] = total
+        received_rows = session.execute(
+            select(SMSRecord.receiver_id, func.coalesce(func.sum(SMSRecord.amount), 0))
+            .where(SMSRecord.receiver_id.in_(user_ids))
+            .group_by(SMSRecord.receiver_id)
+        )
+        for uid, total in received_rows:
+            totals[uid][1] = total
+        return {uid: tuple(pair) for uid, pair in totals.items()}
+    
+    def to_dict(self, stats=None):
+        """Convert user object to dictionary.
+
+        Callers serializing many users should pass a precomputed
+        ``stats`` dict (total_transactions, total_sent, total_received,
+        net_flow) from one batched aggregate query; without it each
+        aggregate hybrid runs its own SQL query per user.
+        """
+        if stats is None:
+            stats = {
+                'total_transactions': self.total_transactions,
+                'total_sent': self.total_sent,
+                'total_received': self.total_received,
+                'net_flow': self.net_flow,
+            }
+        result = dict(zip(_USER_FIELDS, _USER_GET(self)))
+        for key in _USER_DATETIME_FIELDS:
+            if (value := result[key]) is not None:
+                result[key] = value.isoformat()
+        result['total_transactions'] = stats['total_transactions']
+        result['total_sent'] = float(stats['total_sent']) if stats['total_sent'] else 0
+        result['total_received'] = float(stats['total_received']) if stats['total_received'] else 0
+        result['net_flow'] = float(stats['net_flow']) if stats['net_flow'] else 0
+        return result
     
     def __repr__(self):
         return f"<User(id={self.id}, phone='{self.phone_number}', name='{self.full_name}')>"
 
 
+def query_sent_transactions(session, user_id, **filters):
+    """Query a user's sent transactions with optional column filters.
+
+    Replaces the old user.sent_transactions.filter(...) dynamic-
+    relationship pattern; keeping the query builder here lets callers
+    attach loader options (selectinload, raiseload) as needed.
+    """
+    return session.execute(
+        select(SMSRecord).where(SMSRecord.sender_id == user_id).filter_by(**filters)
+    ).scalars()
+
+
+def query_received_transactions(session, user_id, **filters):
+    """Query a user's received transactions with optional column filters"""
+    return session.execute(
+        select(SMSRecord).where(SMSRecord.receiver_id == user_id).filter_by(**filters)
+    ).scalars()
+
+
 class SMSRecord(Base):
     """
     SMS Record entity representing raw SMS data and parsed transactions
@@ -228,7 +489,7 @@ class SMSRecord(Base):
     id = Column(Integer, primary_key=True, index=True, autoincrement=True,
                 comment="Unique identifier for the SMS record")
     uuid = Column(String(36), unique=True, index=True, nullable=False,
-                  server_default=text("UUID()"),
+                  default=generate_uuid7,
                   comment="Universally unique identifier for the SMS")
     
     # Original SMS data
@@ -238,8 +499,13 @@ class SMSRecord(Base):
                       comment="SMS protocol (0=SMS, 1=MMS)")
     address = Column(String(100), nullable=False, index=True,
                      comment="Sender address (usually 'M-Money')")
-    body = Column(Text, nullable=False,
-                  comment="Full SMS body text")
+    # Wide, rarely-filtered columns are deferred: list and aggregate
+    # queries skip them (body alone dominates bytes-per-row), and any
+    # access to one loads the whole 'content' group in a single SELECT.
+    # Queries that serialize bodies opt back in with undefer/undefer_group.
+    body = deferred(Column(Text, nullable=False,
+                           comment="Full SMS body text"),
+                    group='content')
     date = Column(DateTime, nullable=False, index=True,
                   comment="Original SMS timestamp from device")
     type = Column(Integer, default=1,
@@ -269,21 +535,24 @@ class SMSRecord(Base):
     
     # Parsed transaction data
     transaction_type = Column(
-        Enum(TransactionType), 
-        nullable=True, 
+        TransactionTypeCode,
+        nullable=True,
         index=True,
-        comment="Parsed transaction type"
+        comment="Parsed transaction type (SMALLINT code)"
     )
-    amount = Column(DECIMAL(12, 2), nullable=True, index=True,
-                    comment="Transaction amount in RWF")
+    # Monetary columns are whole-RWF integers: RWF has no minor unit in
+    # the SMS data, BIGINT is half the width of DECIMAL(12,2), and the
+    # aggregate math runs on C-level ints instead of Decimal objects
+    amount = Column(BigInteger, nullable=True, index=True,
+                    comment="Transaction amount in whole RWF")
     currency = Column(String(3), default="RWF",
                       comment="Transaction currency (default: RWF)")
-    fee = Column(DECIMAL(12, 2), default=Decimal('0.00'),
-                 comment="Transaction fee")
-    balance_before = Column(DECIMAL(12, 2), nullable=True,
-                            comment="Balance before transaction")
-    balance_after = Column(DECIMAL(12, 2), nullable=True, index=True,
-                           comment="Balance after transaction")
+    fee = Column(BigInteger, default=0,
+                 comment="Transaction fee in whole RWF")
+    balance_before = Column(BigInteger, nullable=True,
+                            comment="Balance before transaction in whole RWF")
+    balance_after = Column(BigInteger, nullable=True, index=True,
+                           comment="Balance after transaction in whole RWF")
     transaction_id = Column(String(50), unique=True, index=True,
                             comment="Financial Transaction Id from provider")
     external_transaction_id = Column(String(50), nullable=True, index=True,
@@ -305,17 +574,21 @@ class SMSRecord(Base):
     agent_phone = Column(String(20), nullable=True,
                          comment="Agent phone number")
     
-    # Additional transaction details
-    message = Column(Text, nullable=True,
-                     comment="Message from sender/receiver")
-    token = Column(String(100), nullable=True,
-                   comment="Token for bill payments (electricity, etc.)")
+    # Additional transaction details (deferred with body — see above)
+    message = deferred(Column(Text, nullable=True,
+                              comment="Message from sender/receiver"),
+                       group='content')
+    token = deferred(Column(String(100), nullable=True,
+                            comment="Token for bill payments (electricity, etc.)"),
+                     group='content')
     reference_number = Column(String(50), nullable=True,
                               comment="Reference number for the transaction")
-    location = Column(String(255), nullable=True,
-                      comment="Transaction location/agent location")
-    device_id = Column(String(100), nullable=True,
-                       comment="Device ID from which SMS originated")
+    location = deferred(Column(String(255), nullable=True,
+                               comment="Transaction location/agent location"),
+                        group='content')
+    device_id = deferred(Column(String(100), nullable=True,
+                                comment="Device ID from which SMS originated"),
+                         group='content')
     
     # Foreign keys to users
     sender_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), 
@@ -330,12 +603,10 @@ class SMSRecord(Base):
                        comment="Whether SMS has been successfully parsed")
     is_valid = Column(Boolean, default=True, index=True,
                       comment="Whether SMS is valid and should be processed")
-    parse_errors = Column(Text, nullable=True,
-                          comment="Any parsing errors encountered")
-    parsing_duration = Column(Float, nullable=True,
-                              comment="Time taken to parse SMS in seconds")
-    parsed_by = Column(String(50), default="system",
-                       comment="System/User that parsed this SMS")
+    # parse_errors/parsing_duration/parsed_by live in SMSParseDebug: they
+    # are null for the overwhelming majority of rows, and carrying a TEXT
+    # column on the hot table costs an off-page pointer per record and
+    # fewer rows per page on scans.
     confidence_score = Column(Float, default=1.0,
                               comment="Confidence score for parsing accuracy (0-1)")
     
@@ -354,32 +625,42 @@ class SMSRecord(Base):
     processed_at = Column(DateTime(timezone=True), nullable=True,
                           comment="Timestamp when SMS was processed")
     
-    # Relationships
+    # Relationships. No mapper-level eager loading: lazy="joined" here
+    # forced a 4-way LEFT OUTER JOIN onto every SMS load (and each
+    # category row duplicated the full SMS row). Endpoints that need a
+    # relation opt in per query with joinedload/selectinload; lazy="raise"
+    # turns a forgotten loader option into an immediate error instead of
+    # a silent per-row SELECT.
     sender = relationship(
-        "User", 
-        foreign_keys=[sender_id], 
+        "User",
+        foreign_keys=[sender_id],
         back_populates="sent_transactions",
-        lazy="joined"
+        lazy="raise"
     )
     receiver = relationship(
-        "User", 
-        foreign_keys=[receiver_id], 
+        "User",
+        foreign_keys=[receiver_id],
         back_populates="received_transactions",
-        lazy="joined"
+        lazy="raise"
     )
     agent = relationship(
-        "User", 
+        "User",
         foreign_keys=[agent_id],
-        lazy="joined"
+        lazy="raise"
     )
     categories = relationship(
-        "TransactionCategory", 
+        "TransactionCategory",
         secondary="sms_category_association",
         back_populates="sms_records",
-        lazy="joined",
+        lazy="raise",
         cascade="all, delete"
     )
-    
+    category_associations = relationship(
+        "SMS_Category_Association",
+        back_populates="sms_record",
+        viewonly=True
+    )
+
     # Table arguments including constraints and indexes
     __table_args__ = (
         # Check constraints
@@ -390,35 +671,55 @@ class SMSRecord(Base):
                        name='check_confidence_score'),
         CheckConstraint('type IN (1, 2)', name='check_sms_type'),
         
-        # Composite indexes for common queries
+        # Composite indexes for common queries. The date-first composite
+        # lets the date-range filters in get_sms_records and
+        # get_dashboard_stats walk a ~30-day slice of the index instead
+        # of scanning the table, with type and amount available for the
+        # narrower filters without a row lookup.
+        Index('idx_sms_date_type_amount', 'transaction_date',
+              'transaction_type', 'amount'),
         Index('idx_transaction_date_type', 'transaction_date', 'transaction_type'),
         Index('idx_amount_type', 'amount', 'transaction_type'),
         Index('idx_sender_receiver_date', 'sender_id', 'receiver_id', 'transaction_date'),
         Index('idx_parsed_valid', 'is_parsed', 'is_valid'),
         Index('idx_date_range', 'transaction_date', 'created_at'),
         Index('idx_search', 'sender_name', 'receiver_name', 'transaction_id'),
-        Index('idx_body_search', 'body', mysql_prefix='FULLTEXT'),
-        
-        # Unique constraints
-        UniqueConstraint('transaction_id', name='uq_transaction_id'),
-        UniqueConstraint('xml_id', name='uq_xml_id'),
-        UniqueConstraint('uuid', name='uq_sms_uuid'),
-        
+
+        # No FULLTEXT index here: tokenizing body on every INSERT
+        # dominated bulk ingest. Full-text search lives off the write
+        # path — sms_body_index (MySQL) or the sms_fts FTS5 table that
+        # database.py maintains on SQLite.
+
+        # No explicit UniqueConstraints here: uuid, xml_id and
+        # transaction_id already declare unique=True at the column
+        # level, and a second constraint created a second identical
+        # unique index to maintain on every INSERT.
+
         # Comment
         {'comment': 'Stores raw SMS records and parsed transaction data'},
     )
-    
-    @validates('amount', 'fee', 'balance_after')
+
+    __mapper_args__ = {"eager_defaults": True}
+
+    @validates('amount', 'fee', 'balance_before', 'balance_after')
     def validate_monetary_values(self, key, value):
-        """Validate monetary values are non-negative"""
-        if value is not None and value < 0:
+        """Validate monetary values are non-negative whole RWF"""
+        if value is None:
+            return value
+        if isinstance(value, (Decimal, float)):
+            value = int(value)
+        if value < 0:
             raise ValueError(f"{key} cannot be negative")
         return value
     
     @validates('transaction_type')
     def validate_transaction_type(self, key, transaction_type):
-        """Validate transaction type"""
-        if transaction_type not in TransactionType:
+        """Validate transaction type, coercing string values to the enum"""
+        if transaction_type is None:
+            return None
+        if isinstance(transaction_type, str):
+            transaction_type = TransactionType(transaction_type)
+        if transaction_type not in _VALID_TX_TYPES:
             raise ValueError(f"Invalid transaction type: {transaction_type}")
         return transaction_type
     
@@ -427,31 +728,30 @@ class SMSRecord(Base):
         """Calculate net amount (amount - fee)"""
         if self.amount is None:
             return None
-        fee = self.fee or Decimal('0.00')
-        return self.amount - fee
+        return self.amount - (self.fee or 0)
+
+    @property
+    def amount_display(self):
+        """Amount as a Decimal for display/formatting contexts"""
+        return Decimal(self.amount) if self.amount is not None else None
     
     @hybrid_property
     def is_incoming(self):
         """Check if transaction is incoming (received/deposit)"""
-        return self.transaction_type in [
-            TransactionType.RECEIVED, 
-            TransactionType.DEPOSIT,
-            TransactionType.REFUND,
-            TransactionType.SALARY
-        ]
-    
+        return self.transaction_type in INCOMING_TYPES
+
+    @is_incoming.expression
+    def is_incoming(cls):
+        return cls.transaction_type.in_(INCOMING_TYPES)
+
     @hybrid_property
     def is_outgoing(self):
         """Check if transaction is outgoing (sent/withdrawal/payment)"""
-        return self.transaction_type in [
-            TransactionType.SENT,
-            TransactionType.WITHDRAWAL,
-            TransactionType.PAYMENT,
-            TransactionType.AIRTIME,
-            TransactionType.BILL_PAYMENT,
-            TransactionType.CASH_POWER,
-            TransactionType.COMMISSION
-        ]
+        return self.transaction_type in OUTGOING_TYPES
+
+    @is_outgoing.expression
+    def is_outgoing(cls):
+        return cls.transaction_type.in_(OUTGOING_TYPES)
     
     @hybrid_property
     def days_since_transaction(self):
@@ -460,52 +760,213 @@ class SMSRecord(Base):
             return None
         delta = datetime.now(timezone.utc) - self.transaction_date
         return delta.days
-    
+
+    @days_since_transaction.expression
+    def days_since_transaction(cls):
+        # SQL form so filters/orders on recency run in the database
+        # (TIMESTAMPDIFF on MySQL). For index-assisted range scans over
+        # idx_transaction_date_type, prefer comparing transaction_date
+        # against a Python-computed cutoff — applying a function to the
+        # column defeats the index.
+        return func.timestampdiff(text("DAY"), cls.transaction_date, func.now())
+
     @hybrid_method
     def matches_pattern(self, pattern):
         """Check if SMS body matches a regex pattern"""
-        import re
-        return re.search(pattern, self.body or '') is not None
+        return _compile_pattern(pattern).search(self.body or '') is not None
     
-    def to_dict(self, include_related=True):
-        """Convert SMS record to dictionary"""
-        result = {
-            'id': self.id,
-            'uuid': self.uuid,
-            'address': self.address,
-            'body': self.body,
-            'date': self.date.isoformat() if self.date else None,
-            'readable_date': self.readable_date,
-            'transaction_type': self.transaction_type.value if self.transaction_type else None,
-            'amount': float(self.amount) if self.amount else None,
-            'currency': self.currency,
-            'fee': float(self.fee) if self.fee else 0.0,
-            'balance_after': float(self.balance_after) if self.balance_after else None,
-            'transaction_id': self.transaction_id,
-            'transaction_date': self.transaction_date.isoformat() if self.transaction_date else None,
-            'sender_name': self.sender_name,
-            'receiver_name': self.receiver_name,
-            'sender_phone': self.sender_phone,
-            'receiver_phone': self.receiver_phone,
-            'is_parsed': self.is_parsed,
-            'is_valid': self.is_valid,
-            'confidence_score': self.confidence_score,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'categories': [cat.code for cat in self.categories] if self.categories else [],
-        }
-        
-        if include_related and self.sender:
+    def to_dict(self, include_related=False, sender=None, receiver=None):
+        """Convert SMS record to dictionary.
+
+        Related users are only serialized when the caller passes
+        prefetched ``sender``/``receiver`` dicts, or explicitly opts in
+        with ``include_related`` on an eager-loaded instance — the old
+        default recursed into User.to_dict per row, re-running its
+        aggregates for every record in a list.
+        """
+        result = dict(zip(_SMS_FIELDS, _SMS_GET(self)))
+        for key in _SMS_DATETIME_FIELDS:
+            if (value := result[key]) is not None:
+                result[key] = value.isoformat()
+        if (tx_type := result['transaction_type']) is not None:
+            result['transaction_type'] = tx_type.value
+        result['amount'] = float(amount) if (amount := result['amount']) else None
+        result['fee'] = float(fee) if (fee := result['fee']) else 0.0
+        result['balance_after'] = (
+            float(balance) if (balance := result['balance_after']) else None
+        )
+        result['categories'] = (
+            [cat.code for cat in self.categories] if self.categories else []
+        )
+
+
+        if sender is not None:
+            result['sender'] = sender
+        elif include_related and self.sender:
             result['sender'] = self.sender.to_dict()
-        if include_related and self.receiver:
+        if receiver is not None:
+            result['receiver'] = receiver
+        elif include_related and self.receiver:
             result['receiver'] = self.receiver.to_dict()
-        
+
         return result
-    
+
+    @classmethod
+    def bulk_insert(cls, session, mappings, batch_size=10_000):
+        """Insert parsed rows through Core insert() in batches.
+
+        ``mappings`` may be plain dicts or SMSRow instances. Each batch
+        compiles to a single executemany (multi-row VALUES via
+        insertmanyvalues) instead of one INSERT+flush per row, which is
+        1-2 orders of magnitude faster at ingest scale. database.py
+        sizes the engine for this path (insertmanyvalues_page_size, and
+        psycopg2's values_plus_batch executemany mode on PostgreSQL).
+        Column validators do NOT fire on this path — callers must
+        pre-validate, e.g. with the module-level compiled patterns.
+        """
+        rows = [
+            row.as_insert_dict() if isinstance(row, SMSRow) else row
+            for row in mappings
+        ]
+        with session.begin():
+            for start in range(0, len(rows), batch_size):
+                session.execute(insert(cls), rows[start:start + batch_size])
+
+    @classmethod
+    def bulk_upsert(cls, session, mappings, conflict_column="transaction_id",
+                    batch_size=1000):
+        """Insert-or-update parsed rows in one statement per batch.
+
+        Re-imports of the same XML file previously needed a SELECT of
+        existing ids before inserting — a read round trip per batch and
+        no way to refresh rows that changed. This compiles to the
+        backend's native upsert (ON CONFLICT DO UPDATE on
+        SQLite/Postgres, ON DUPLICATE KEY UPDATE on MySQL) keyed on
+        ``conflict_column``, so the server resolves conflicts with no
+        read-before-write. Batches stay moderate to respect bind-param
+        and max_allowed_packet limits. Same caveat as bulk_insert:
+        column validators do not fire.
+        """
+        rows = [
+            row.as_insert_dict() if isinstance(row, SMSRow) else row
+            for row in mappings
+        ]
+        if not rows:
+            return
+        dialect = session.get_bind().dialect.name
+        update_columns = [
+            key for key in rows[0]
+            if key not in (conflict_column, "id", "uuid", "created_at")
+        ]
+        with session.begin():
+            for start in range(0, len(rows), batch_size):
+                chunk = rows[start:start + batch_size]
+                if dialect == "mysql":
+                    stmt = mysql_insert(cls.__table__).values(chunk)
+                    set_map = {key: getattr(stmt.inserted, key)
+                               for key in update_columns}
+                    set_map["updated_at"] = func.now()
+                    stmt = stmt.on_duplicate_key_update(set_map)
+                else:
+                    insert_fn = pg_insert if dialect == "postgresql" else sqlite_insert
+                    stmt = insert_fn(cls.__table__).values(chunk)
+                    set_map = {key: getattr(stmt.excluded, key)
+                               for key in update_columns}
+                    set_map["updated_at"] = func.now()
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=[conflict_column], set_=set_map
+                    )
+                session.execute(stmt)
+
     def __repr__(self):
         return f"<SMSRecord(id={self.id}, type={self.transaction_type}, amount={self.amount})>"
 
 
+@dataclasses.dataclass(slots=True)
+class SMSRow:
+    """Lightweight parsed-SMS row for the bulk ingest path.
+
+    A plain slotted dataclass carries none of the ORM's instrumented
+    attribute machinery (state dict, history, validators), so the parser
+    can allocate millions of these far cheaper than SMSRecord instances.
+    Feed them to SMSRecord.bulk_insert.
+    """
+    address: str
+    body: str
+    date: datetime
+    readable_date: Optional[str] = None
+    service_center: Optional[str] = None
+    protocol: int = 0
+    type: int = 1
+    contact_name: str = "(Unknown)"
+    xml_id: Optional[str] = None
+    transaction_type: Optional[TransactionType] = None
+    amount: Optional[int] = None
+    fee: int = 0
+    balance_after: Optional[int] = None
+    transaction_id: Optional[str] = None
+    transaction_date: Optional[datetime] = None
+    sender_name: Optional[str] = None
+    receiver_name: Optional[str] = None
+    is_parsed: bool = False
+
+    def as_insert_dict(self):
+        """Plain dict form for Core insert()"""
+        return dataclasses.asdict(self)
+
+
+class SMSParseDebug(Base):
+    """
+    Parse diagnostics split out of sms_records
+
+    Written only when a parse actually fails (or when timing is being
+    collected), so the hot table stays narrow for the common fully-parsed
+    row. One-to-one with SMSRecord via the shared primary key.
+    """
+    __tablename__ = "sms_parse_debug"
+
+    sms_id = Column(Integer, ForeignKey("sms_records.id", ondelete="CASCADE"),
+                    primary_key=True,
+                    comment="SMS record this debug row belongs to")
+    parse_errors = Column(Text, nullable=True,
+                          comment="Any parsing errors encountered")
+    parsing_duration = Column(Float, nullable=True,
+                              comment="Time taken to parse SMS in seconds")
+    parsed_by = Column(String(50), default="system",
+                       comment="System/User that parsed this SMS")
+
+    sms_record = relationship("SMSRecord", lazy="select")
+
+    def __repr__(self):
+        return f"<SMSParseDebug(sms_id={self.sms_id})>"
+
+
+class SMSBodyIndex(Base):
+    """
+    Full-text search sidecar for SMS bodies (MySQL)
+
+    Keeping the FULLTEXT index on a sibling table takes tokenization off
+    the bulk-insert hot path: ingest writes sms_records untouched, and a
+    background task copies (sms_id, body) here after commit. Search
+    queries MATCH against this table and JOIN back. On SQLite the
+    equivalent is the sms_fts FTS5 table created in database.py.
+    """
+    __tablename__ = "sms_body_index"
+
+    sms_id = Column(Integer, ForeignKey("sms_records.id", ondelete="CASCADE"),
+                    primary_key=True,
+                    comment="SMS record this body belongs to")
+    body = Column(Text, nullable=False,
+                  comment="Copy of the SMS body for full-text search")
+
+    __table_args__ = (
+        Index('idx_body_fts', 'body', mysql_prefix='FULLTEXT'),
+    )
+
+    def __repr__(self):
+        return f"<SMSBodyIndex(sms_id={self.sms_id})>"
+
+
 class TransactionCategory(Base):
     """
     Transaction Category entity for classifying transactions
@@ -518,7 +979,7 @@ class TransactionCategory(Base):
     id = Column(Integer, primary_key=True, index=True, autoincrement=True,
                 comment="Unique identifier for the category")
     uuid = Column(String(36), unique=True, index=True, nullable=False,
-                  server_default=text("UUID()"),
+                  default=generate_uuid7,
                   comment="Universally unique identifier for the category")
     
     # Category information
@@ -544,8 +1005,10 @@ class TransactionCategory(Base):
                   comment="Icon name for UI display")
     color = Column(String(7), nullable=True,
                    comment="Hex color code for UI (#RRGGBB)")
-    metadata = Column(JSON, default=dict,
-                      comment="Additional metadata for the category")
+    # Attribute renamed from `metadata` (reserved by the declarative
+    # base); name= keeps the DB column unchanged so no migration needed
+    extra_metadata = Column("metadata", JSON, default=dict,
+                            comment="Additional metadata for the category")
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), 
@@ -558,21 +1021,29 @@ class TransactionCategory(Base):
                         nullable=False,
                         comment="Last update timestamp")
     
-    # Relationships
+    # Relationships. Plain lazy="select" on both directions: with
+    # lazy="joined" every category fetch dragged its parent along in a
+    # self-join (and each tree level multiplied rows). Tree rendering
+    # goes through load_category_tree() below, which fetches the whole
+    # hierarchy in one recursive-CTE round trip.
     parent = relationship(
-        "TransactionCategory", 
+        "TransactionCategory",
         remote_side=[id],
-        backref="children",
-        lazy="joined"
+        backref=backref("children", lazy="select"),
+        lazy="select"
     )
     sms_records = relationship(
-        "SMSRecord", 
+        "SMSRecord",
         secondary="sms_category_association",
         back_populates="categories",
-        lazy="dynamic",
         cascade="all, delete"
     )
-    
+    sms_associations = relationship(
+        "SMS_Category_Association",
+        back_populates="category",
+        viewonly=True
+    )
+
     # Table arguments
     __table_args__ = (
         # Check constraints
@@ -588,18 +1059,20 @@ class TransactionCategory(Base):
         # Comment
         {'comment': 'Categories for transaction types (transfer, deposit, payment, etc.)'},
     )
-    
+
+    __mapper_args__ = {"eager_defaults": True}
+
     @validates('code')
     def validate_code(self, key, code):
         """Validate category code format"""
-        if not re.match(r'^[A-Z_]{2,10}$', code):
+        if not CODE_RE.match(code):
             raise ValueError("Category code must be 2-10 uppercase letters or underscores")
         return code
     
     @validates('color')
     def validate_color(self, key, color):
         """Validate color hex code"""
-        if color and not re.match(r'^#[0-9A-Fa-f]{6}$', color):
+        if color and not COLOR_RE.match(color):
             raise ValueError("Color must be a hex code (#RRGGBB)")
         return color
     
@@ -613,31 +1086,41 @@ class TransactionCategory(Base):
     @hybrid_property
     def transaction_count(self):
         """Get number of transactions in this category"""
-        return len(self.sms_records.all()) if self.sms_records else 0
-    
-    def to_dict(self, include_children=True):
-        """Convert category to dictionary"""
-        result = {
-            'id': self.id,
-            'uuid': self.uuid,
-            'name': self.name,
-            'description': self.description,
-            'code': self.code,
-            'level': self.level,
-            'path': self.path,
-            'full_path': self.full_path,
-            'is_active': self.is_active,
-            'icon': self.icon,
-            'color': self.color,
-            'transaction_count': self.transaction_count,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-        }
-        
-        if include_children and self.children:
+        # COUNT(*) over the association table — the old .all() pulled
+        # every SMS row just to take len() of the list
+        return object_session(self).execute(
+            select(func.count()).select_from(SMS_Category_Association).where(
+                SMS_Category_Association.category_id == self.id
+            )
+        ).scalar() or 0
+
+    @transaction_count.expression
+    def transaction_count(cls):
+        return select(func.count()).select_from(SMS_Category_Association).where(
+            SMS_Category_Association.category_id == cls.id
+        ).scalar_subquery()
+    
+    def to_dict(self, include_children=True, prebuilt_children=None):
+        """Convert category to dictionary.
+
+        Pass ``prebuilt_children`` (a list of already-serialized child
+        dicts, e.g. from load_category_tree) to avoid triggering a lazy
+        load of the children collection per category.
+        """
+        result = dict(zip(_CATEGORY_FIELDS, _CATEGORY_GET(self)))
+        for key in _CATEGORY_DATETIME_FIELDS:
+            if (value := result[key]) is not None:
+                result[key] = value.isoformat()
+        result['full_path'] = self.full_path
+        result['transaction_count'] = self.transaction_count
+
+
+        if prebuilt_children is not None:
+            result['children'] = prebuilt_children
+        elif include_children and self.children:
             result['children'] = [child.to_dict(include_children=False) for child in self.children]
-        
-        if self.parent and include_children:
+
+        if prebuilt_children is None and include_children and self.parent:
             result['parent'] = {
                 'id': self.parent.id,
                 'name': self.parent.name,
@@ -645,11 +1128,127 @@ class TransactionCategory(Base):
             }
         
         return result
-    
+
+    @classmethod
+    def load_tree(cls, session, root_id, depth=3):
+        """Load one category's subtree in a single round trip.
+
+        Rooted counterpart of load_category_tree: one recursive CTE
+        anchored at ``root_id`` (bounded by ``depth`` levels) replaces
+        the O(tree-size) lazy loads that to_dict's recursion into
+        self.children would otherwise issue per node.
+
+        Returns the root category dict with nested 'children', or None
+        if the root does not exist.
+        """
+        tree = (
+            select(cls.id, text("0").label("depth"))
+            .where(cls.id == root_id)
+            .cte(name="category_subtree", recursive=True)
+        )
+        tree = tree.union_all(
+            select(cls.id, tree.c.depth + 1)
+            .join(tree, cls.parent_id == tree.c.id)
+            .where(tree.c.depth < depth)
+        )
+        categories = session.execute(
+            select(cls).join(tree, cls.id == tree.c.id)
+        ).scalars().all()
+        if not categories:
+            return None
+
+        children_of = {}
+        root = None
+        for category in categories:
+            if category.id == root_id:
+                root = category
+            else:
+                children_of.setdefault(category.parent_id, []).append(category)
+
+        def build(category):
+            return category.to_dict(prebuilt_children=[
+                build(child) for child in children_of.get(category.id, [])
+            ])
+
+        return build(root)
+
     def __repr__(self):
         return f"<TransactionCategory(id={self.id}, code='{self.code}', name='{self.name}')>"
 
 
+def load_category_tree(session):
+    """Load the full category hierarchy in one round trip.
+
+    Fetches every reachable category with a WITH RECURSIVE CTE anchored
+    at the roots, then links the tree in Python — no per-level
+    parent/children lazy loads.
+
+    Returns a list of root category dicts with nested 'children'.
+    """
+    tree = (
+        select(TransactionCategory.id)
+        .where(TransactionCategory.parent_id.is_(None))
+        .cte(name="category_tree", recursive=True)
+    )
+    tree = tree.union_all(
+        select(TransactionCategory.id).join(
+            tree, TransactionCategory.parent_id == tree.c.id
+        )
+    )
+    categories = session.execute(
+        select(TransactionCategory).join(tree, TransactionCategory.id == tree.c.id)
+    ).scalars().all()
+
+    children_of = {}
+    for category in categories:
+        children_of.setdefault(category.parent_id, []).append(category)
+
+    def build(category):
+        return category.to_dict(prebuilt_children=[
+            build(child) for child in children_of.get(category.id, [])
+        ])
+
+    return [build(root) for root in children_of.get(None, [])]
+
+
+class SMSMonthlyRollup(Base):
+    """
+    Pre-aggregated monthly transaction volumes
+
+    Dashboard charts over (month, type) read this table — O(months x
+    types) rows — instead of scanning the ever-growing sms_records.
+    Rebuilt periodically by metric_refresher with one aggregate query;
+    the bulk ingest path bypasses ORM events, so per-insert increment
+    hooks would silently miss most rows.
+    """
+    __tablename__ = "sms_monthly_rollup"
+
+    year = Column(Integer, primary_key=True,
+                  comment="Calendar year of the transactions")
+    month = Column(SmallInteger, primary_key=True,
+                   comment="Calendar month (1-12)")
+    transaction_type = Column(TransactionTypeCode, primary_key=True,
+                              comment="Transaction type (SMALLINT code)")
+    transaction_count = Column(Integer, nullable=False, default=0,
+                               comment="Number of transactions in the bucket")
+    total_amount = Column(BigInteger, nullable=False, default=0,
+                          comment="Summed amount in whole RWF")
+
+    def to_dict(self):
+        """Convert rollup bucket to dictionary"""
+        return {
+            'year': self.year,
+            'month': self.month,
+            'transaction_type': self.transaction_type.value,
+            'transaction_count': self.transaction_count,
+            'total_amount': self.total_amount,
+        }
+
+    def __repr__(self):
+        return (f"<SMSMonthlyRollup({self.year}-{self.month:02d}, "
+                f"type={self.transaction_type}, count={self.transaction_count})>")
+
+
 class SMS_Category_Association(Base):
     """
     Junction table for many-to-many relationship between SMS records and categories
@@ -685,16 +1284,24 @@ class SMS_Category_Association(Base):
         comment="Timestamp when category was assigned"
     )
     
-    # Relationships
-    sms_record = relationship("SMSRecord", backref="category_associations")
-    category = relationship("TransactionCategory", backref="sms_associations")
+    # Relationships. viewonly like their back_populates partners: the
+    # secondary= relationships above own writes to this table, so these
+    # read-only views would otherwise overlap them (SAWarning at mapper
+    # configuration).
+    sms_record = relationship(
+        "SMSRecord", back_populates="category_associations", viewonly=True
+    )
+    category = relationship(
+        "TransactionCategory", back_populates="sms_associations", viewonly=True
+    )
     
     # Table arguments
     __table_args__ = (
         CheckConstraint('confidence >= 0 AND confidence <= 1', name='check_association_confidence'),
-        Index('idx_association_sms', 'sms_id'),
+        # The composite primary key (sms_id, category_id) already covers
+        # sms_id-prefixed lookups; only the reverse direction needs its
+        # own index
         Index('idx_association_category', 'category_id'),
-        Index('idx_association_sms_category', 'sms_id', 'category_id'),
         {'comment': 'Many-to-many relationship between SMS records and categories'},
     )
     
@@ -721,15 +1328,15 @@ class SystemLog(Base):
     id = Column(Integer, primary_key=True, index=True, autoincrement=True,
                 comment="Unique identifier for the log entry")
     uuid = Column(String(36), unique=True, index=True, nullable=False,
-                  server_default=text("UUID()"),
+                  default=generate_uuid7,
                   comment="Universally unique identifier for the log entry")
     
     # Log information
     level = Column(
-        Enum(LogLevel), 
-        nullable=False, 
+        LogLevelCode,
+        nullable=False,
         index=True,
-        comment="Log level (INFO, WARNING, ERROR, DEBUG, CRITICAL)"
+        comment="Log level code (INFO, WARNING, ERROR, DEBUG, CRITICAL)"
     )
     module = Column(String(100), nullable=False, index=True,
                     comment="Module/component name (e.g., 'API', 'Parser', 'Database')")
@@ -764,18 +1371,20 @@ class SystemLog(Base):
     error_type = Column(String(100), nullable=True,
                         comment="Type of error (e.g., 'ValidationError', 'DatabaseError')")
     
-    # Metadata
+    # Metadata. 'metadata' is reserved on declarative classes (it would
+    # shadow Base.metadata), so the attribute is extra_metadata mapped
+    # onto the unchanged "metadata" column.
     tags = Column(JSON, default=list,
                   comment="Tags for categorization and filtering")
-    metadata = Column(JSON, default=dict,
-                      comment="Additional metadata")
-    
+    extra_metadata = Column("metadata", JSON, default=dict,
+                            comment="Additional metadata")
+
     # Timestamps
-    created_at = Column(DateTime(timezone=True), 
+    created_at = Column(DateTime(timezone=True),
                         server_default=func.now(),
                         nullable=False,
                         comment="Log creation timestamp")
-    
+
     # Relationships
     user = relationship("User", back_populates="logs")
     
@@ -795,7 +1404,9 @@ class SystemLog(Base):
         # Comment
         {'comment': 'System logs for audit trails and error tracking'},
     )
-    
+
+    __mapper_args__ = {"eager_defaults": True}
+
     @validates('level')
     def validate_level(self, key, level):
         """Validate log level"""
@@ -816,7 +1427,13 @@ class SystemLog(Base):
         return self.level == LogLevel.WARNING
     
     def to_dict(self, include_user=True):
-        """Convert log entry to dictionary"""
+        """Convert log entry to dictionary.
+
+        The user block is only emitted when the relationship is already
+        loaded (call sites use selectinload) — serializing a page of
+        logs must not fire one lazy SELECT per row. Unloaded instances
+        fall back to the bare user_id.
+        """
         result = {
             'id': self.id,
             'uuid': self.uuid,
@@ -839,7 +1456,8 @@ class SystemLog(Base):
             'is_warning': self.is_warning,
         }
         
-        if include_user and self.user:
+        user_loaded = 'user' not in inspect(self).unloaded
+        if include_user and user_loaded and self.user:
             result['user'] = {
                 'id': self.user.id,
                 'phone_number': self.user.phone_number,
@@ -847,7 +1465,7 @@ class SystemLog(Base):
             }
         else:
             result['user_id'] = self.user_id
-        
+
         return result
     
     def __repr__(self):
@@ -866,7 +1484,7 @@ class OTPRecord(Base):
     id = Column(Integer, primary_key=True, index=True, autoincrement=True,
                 comment="Unique identifier for the OTP record")
     uuid = Column(String(36), unique=True, index=True, nullable=False,
-                  server_default=text("UUID()"),
+                  default=generate_uuid7,
                   comment="Universally unique identifier for the OTP")
     
     # OTP information
@@ -897,9 +1515,9 @@ class OTPRecord(Base):
     user_agent = Column(String(500), nullable=True,
                         comment="User agent of the requester")
     
-    # Metadata
-    metadata = Column(JSON, default=dict,
-                      comment="Additional metadata (e.g., user_id, session_id)")
+    # Metadata ('metadata' is reserved on declarative classes — see SystemLog)
+    extra_metadata = Column("metadata", JSON, default=dict,
+                            comment="Additional metadata (e.g., user_id, session_id)")
     delivery_method = Column(String(20), default="sms",
                              comment="Delivery method (sms, email, app)")
     delivery_status = Column(String(20), default="pending",
@@ -928,27 +1546,39 @@ class OTPRecord(Base):
         CheckConstraint('delivery_status IN ("pending", "sent", "failed", "delivered")', 
                        name='check_delivery_status'),
         
-        # Indexes for performance
-        Index('idx_otp_phone_expires', 'phone_number', 'expires_at', 'is_used'),
-        Index('idx_otp_email_expires', 'email', 'expires_at', 'is_used'),
+        # Indexes for performance. Equality columns before the range
+        # column: the verification query filters phone/email and is_used
+        # with '=' and expires_at with '>', so this order lets the
+        # B-tree seek straight to the live rows instead of range-scanning
+        # every historical OTP for the phone and post-filtering.
+        Index('idx_otp_phone_expires', 'phone_number', 'is_used', 'expires_at'),
+        Index('idx_otp_email_expires', 'email', 'is_used', 'expires_at'),
+        # Postgres-only partial index over just the live OTPs: used rows
+        # vastly outnumber active ones, so this stays a fraction of the
+        # table size. Other backends ignore postgresql_where and build a
+        # plain composite index, which the lookups can still use.
+        Index('idx_otp_active', 'phone_number', 'expires_at',
+              postgresql_where=text('is_used = false')),
         Index('idx_otp_purpose', 'purpose', 'created_at'),
         Index('idx_otp_used', 'is_used', 'created_at'),
         
         # Comment
         {'comment': 'One-time password records for security and authentication'},
     )
-    
+
+    __mapper_args__ = {"eager_defaults": True}
+
     @validates('otp_code')
     def validate_otp_code(self, key, otp_code):
         """Validate OTP code format"""
-        if not re.match(r'^[0-9]{4,10}$', otp_code):
+        if not OTP_CODE_RE.match(otp_code):
             raise ValueError("OTP code must be 4-10 digits")
         return otp_code
     
     @validates('phone_number')
     def validate_phone_number(self, key, phone_number):
         """Validate phone number format"""
-        if not re.match(r'^\+?\d{10,15}$', phone_number):
+        if not PHONE_RE.match(phone_number):
             raise ValueError("Invalid phone number format")
         return phone_number
     
@@ -956,32 +1586,47 @@ class OTPRecord(Base):
     def validate_email(self, key, email):
         """Validate email format if provided"""
         if email is not None:
-            if not re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', email):
+            if not EMAIL_RE.match(email):
                 raise ValueError("Invalid email format")
         return email
     
     @hybrid_property
     def is_expired(self):
         """Check if OTP is expired"""
-        from datetime import datetime
         return datetime.now(timezone.utc) > self.expires_at
-    
+
+    @is_expired.expression
+    def is_expired(cls):
+        return cls.expires_at < func.now()
+
     @hybrid_property
     def is_valid(self):
         """Check if OTP is valid (not used and not expired)"""
         return not self.is_used and not self.is_expired
-    
+
+    @is_valid.expression
+    def is_valid(cls):
+        # Matches idx_otp_active / the equality-then-range composite
+        # indexes, so "all valid OTPs" filters run as index scans
+        # instead of fetch-everything-then-filter-in-Python
+        return and_(cls.is_used == expression.false(),
+                    cls.expires_at > func.now())
+
     @hybrid_property
     def seconds_remaining(self):
         """Get seconds remaining until expiration"""
-        from datetime import datetime
         if self.is_expired:
             return 0
         delta = self.expires_at - datetime.now(timezone.utc)
         return int(delta.total_seconds())
-    
+
     def to_dict(self, include_sensitive=False):
         """Convert OTP record to dictionary"""
+        # One clock read per row: going through the is_expired/is_valid/
+        # seconds_remaining properties would call datetime.now three
+        # times (and could even disagree across a second boundary)
+        now = datetime.now(timezone.utc)
+        expired = now > self.expires_at
         result = {
             'id': self.id,
             'uuid': self.uuid,
@@ -997,16 +1642,45 @@ class OTPRecord(Base):
             'delivery_status': self.delivery_status,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'is_expired': self.is_expired,
-            'is_valid': self.is_valid,
-            'seconds_remaining': self.seconds_remaining,
+            'is_expired': expired,
+            'is_valid': not self.is_used and not expired,
+            'seconds_remaining': 0 if expired else int((self.expires_at - now).total_seconds()),
         }
         
         if include_sensitive:
             result['otp_code'] = self.otp_code_plain
-        
+
         return result
-    
+
+    @classmethod
+    def purge_expired(cls, session, batch=1000, max_seconds=30.0):
+        """Delete expired OTPs in bounded batches.
+
+        An unbounded DELETE over a large expiry backlog holds table
+        locks for minutes. Each iteration deletes at most ``batch``
+        rows (ids fetched first so the statement is a plain IN-list
+        delete on every backend) and commits, so lock windows stay
+        short and predictable; the loop stops when the backlog is
+        drained or the wall-clock budget runs out. Returns the number
+        of rows deleted.
+        """
+        deadline = time.monotonic() + max_seconds
+        total = 0
+        while True:
+            ids = session.scalars(
+                select(cls.id)
+                .where(cls.expires_at < datetime.now())
+                .limit(batch)
+            ).all()
+            if not ids:
+                break
+            session.execute(delete(cls).where(cls.id.in_(ids)))
+            session.commit()
+            total += len(ids)
+            if len(ids) < batch or time.monotonic() > deadline:
+                break
+        return total
+
     def __repr__(self):
         return f"<OTPRecord(id={self.id}, phone='{self.phone_number}', purpose='{self.purpose}')>"
 
@@ -1042,6 +1716,12 @@ class DashboardCache(Base):
     
     __table_args__ = (
         Index('idx_cache_expires_type', 'expires_at', 'cache_type'),
+        # Covering index for the cache-hit path on Postgres: INCLUDE
+        # carries the payload and expiry in the index leaf, so a lookup
+        # by cache_key is an index-only scan with no heap fetch. Other
+        # backends ignore postgresql_include and keep a plain key index.
+        Index('idx_cache_key_cover', 'cache_key',
+              postgresql_include=['cache_data', 'expires_at']),
         CheckConstraint('expires_at > created_at', name='check_cache_expiry'),
         {'comment': 'Cache for dashboard statistics to improve performance'},
     )
@@ -1049,7 +1729,6 @@ class DashboardCache(Base):
     @hybrid_property
     def is_expired(self):
         """Check if cache is expired"""
-        from datetime import datetime
         return datetime.now(timezone.utc) > self.expires_at
     
     def to_dict(self):
@@ -1077,7 +1756,7 @@ class APIAccessLog(Base):
     id = Column(Integer, primary_key=True, index=True, autoincrement=True,
                 comment="Unique identifier for the access log")
     uuid = Column(String(36), unique=True, index=True, nullable=False,
-                  server_default=text("UUID()"))
+                  default=generate_uuid7)
     
     # Request information
     method = Column(String(10), nullable=False, index=True,
@@ -1086,22 +1765,31 @@ class APIAccessLog(Base):
                       comment="API endpoint path")
     query_params = Column(JSON, nullable=True,
                           comment="Query parameters")
-    request_body = Column(Text, nullable=True,
-                          comment="Request body (truncated if too large)")
+    # Bodies are truncated to 8KB and zlib-compressed before the INSERT:
+    # shipping megabytes of JSON per logged request dominated insert
+    # cost and WAL volume. Write via compress_body, read via the
+    # *_body_text properties.
+    request_body = Column(LargeBinary, nullable=True,
+                          comment="Request body (truncated, zlib-compressed)")
     
     # Response information
     status_code = Column(Integer, nullable=False, index=True,
                          comment="HTTP status code")
-    response_body = Column(Text, nullable=True,
-                           comment="Response body (truncated if too large)")
+    response_body = Column(LargeBinary, nullable=True,
+                           comment="Response body (truncated, zlib-compressed)")
     response_size = Column(Integer, nullable=True,
                            comment="Response size in bytes")
     
     # User and session information
-    user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), 
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"),
                      nullable=True, index=True)
-    api_key = Column(String(100), nullable=True, index=True,
-                     comment="API key used for authentication")
+    # Lookups go through the 16-byte hash index; the plaintext key is
+    # kept unindexed for audit only (a 100-byte varchar index is ~4x
+    # the size and pays string comparison per probe)
+    api_key = Column(String(100), nullable=True,
+                     comment="API key used for authentication (audit only)")
+    api_key_hash = Column(LargeBinary(16), nullable=True, index=True,
+                          comment="blake2b-128 of the API key, used for lookups")
     session_id = Column(String(100), nullable=True, index=True,
                         comment="User session identifier")
     
@@ -1119,11 +1807,11 @@ class APIAccessLog(Base):
     server = Column(String(100), nullable=True,
                     comment="Server that handled the request")
     
-    # Metadata
+    # Metadata ('metadata' is reserved on declarative classes — see SystemLog)
     tags = Column(JSON, default=list,
                   comment="Tags for categorization")
-    metadata = Column(JSON, default=dict,
-                      comment="Additional metadata")
+    extra_metadata = Column("metadata", JSON, default=dict,
+                            comment="Additional metadata")
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), 
@@ -1144,6 +1832,16 @@ class APIAccessLog(Base):
         {'comment': 'API access logs for monitoring and analytics'},
     )
     
+    @property
+    def request_body_text(self):
+        """Logged request body, decompressed"""
+        return decompress_body(self.request_body)
+
+    @property
+    def response_body_text(self):
+        """Logged response body, decompressed"""
+        return decompress_body(self.response_body)
+
     @hybrid_property
     def is_success(self):
         """Check if request was successful (2xx status code)"""
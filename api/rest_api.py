@@ -1,184 +1,158 @@
 import base64
-import json
+import hmac
 import os
 
-from http.server import HTTPServer, BaseHTTPRequestHandler
+import orjson
+import uvicorn
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
+
+# Standalone DSA demo API. The old version used http.server's
+# BaseHTTPRequestHandler, which handles one blocking request at a time and
+# re-parses headers in Python per request. The workload here is pure I/O
+# (auth check + dict lookup + JSON write), so an asyncio server lets one
+# process serve many concurrent clients instead of a queue of one.
+# orjson serializes every response; stdlib json.dumps is the dominant CPU
+# cost on JSON-heavy endpoints and orjson emits UTF-8 bytes directly
+app = FastAPI(
+    title="MoMo DSA Demo API",
+    docs_url=None,
+    redoc_url=None,
+    default_response_class=ORJSONResponse,
+)
+
+# The full expected Authorization header, encoded once at import. Each
+# request is then one constant-time compare on the raw header value —
+# no split, base64 decode or UTF-8 decode on the hot path (same scheme
+# as api.main.verify_credentials). Bytes, because compare_digest raises
+# TypeError on non-ASCII str operands.
+_EXPECTED_AUTH = b"Basic " + base64.b64encode(b"team5:ALU2025")
+
+
+def check_login(request: Request):
+    header = request.headers.get("authorization", "")
+    if not hmac.compare_digest(
+        header.encode("utf-8", "surrogateescape"), _EXPECTED_AUTH
+    ):
+        raise HTTPException(
+            status_code=401,
+            detail="Unauthorized. Please login.",
+            headers={"WWW-Authenticate": 'Basic realm="MoMo API"'},
+        )
 
-# Global lists to hold our data once the server starts
-transactions = []        # We use this for Linear Search (slower, but keeps order)
-transactions_dict = {}   # We use this for Dictionary Lookup (super fast O(1) speed)
 
 def load_parsed_data():
-    
-    # Finds the JSON file in the ../dsa/ folder and loads it into memory.
-  
-    global transactions, transactions_dict
-    
+    """Find the JSON file in the ../dsa/ folder and load it into memory."""
+    # One insertion-ordered dict is the canonical store: it preserves the
+    # file order for GET /transactions while giving O(1) lookup, update
+    # and delete by id — no parallel list to rebuild on every DELETE
+    transactions_dict = {}
+
     # This path tells the script: "Go out of the api folder, look in dsa folder"
     json_path = os.path.join(os.path.dirname(__file__), '..', 'dsa', 'transactions.json')
 
     if os.path.exists(json_path):
-        with open(json_path, 'r') as f:
-            transactions = json.load(f)
-            # We map the data to a dictionary right away so searching is instant later
-            for txn in transactions:
+        with open(json_path, 'rb') as f:
+            for txn in orjson.loads(f.read()):
                 transactions_dict[txn['id']] = txn
-        print(f" Success! Loaded {len(transactions)} records from {json_path}")
+        print(f" Success! Loaded {len(transactions_dict)} records from {json_path}")
     else:
         print(f" Error:  couldn't find '{json_path}'. Did you run the parser first?")
 
-
-class APIHandler(BaseHTTPRequestHandler):
-
-    def check_login(self):
-       # this code handles the security check
-        auth_header = self.headers.get('Authorization')
-        if not auth_header:
-            return False
-
-        try:
-            # The header looks like 'Basic [Base64String]', so we split it
-            auth_type, encoded_creds = auth_header.split(' ', 1)
-            if auth_type != 'Basic':
-                return False
-
-            # Decrypt the string to check the username/password
-            decoded = base64.b64decode(encoded_creds).decode('utf-8')
-            return decoded == "team5:ALU2025"
-        except Exception as e:
-            print(f"Auth error: {e}")
-            return False
-
-    def do_GET(self):
-        # First, check if the user is allowed in
-        if not self.check_login():
-            self.send_response(401)
-            # This header is what triggers the popup box in your browser!
-            self.send_header('WWW-Authenticate', 'Basic realm="MoMo API"')
-            self.end_headers()
-            self.wfile.write(b'{"error": "Unauthorized. Please login."}')
-            return
-
-        # Path 1: Get all transactions
-        if self.path == '/transactions':
-            self._send_json(transactions)
-        # Path 2: Get one specific transaction by ID
-        elif self.path.startswith('/transactions/'):
-            try:
-                # Grab the ID from the end of the URL
-                txn_id = int(self.path.split('/')[-1])
-
-                # DSA Efficiency: We use the Dictionary here for O(1) lookup
-                txn = transactions_dict.get(txn_id)
-
-                if txn:
-                    self._send_json(txn)
-                else:
-                    self._send_json({"error": "Transaction not found"}, 404)
-
-            except ValueError:
-                self._send_json({"error": "Invalid ID format"}, 400)
-
-def do_POST(self):
-    if not self.check_login():
-        self.send_response(401)
-        self.end_headers()
-        return
-
-    try:
-        # Figure out how much data the user is sending
-        length = int(self.headers.get('Content-Length', 0))
-        body = self.rfile.read(length)
-        new_data = json.loads(body)
-
-        # Assign a new ID (just the next number in line)
-        new_id = len(transactions) + 1
-        new_data['id'] = new_id
-
-        # Save it to both our memory structures
-        transactions.append(new_data)
-        transactions_dict[new_id] = new_data
-
-        self._send_json(new_data, 201)
-
-    except Exception as e:
-        self._send_json({"error": str(e)}, 400)
-
+    app.state.transactions_dict = transactions_dict
+    app.state.next_id = max(transactions_dict, default=0) + 1
 
 
+@app.on_event("startup")
+async def startup_event():
+    load_parsed_data()
 
 
+# Above this many rows the full-list response is streamed in batches so
+# peak memory stays one batch wide instead of the whole serialized payload
+STREAM_THRESHOLD = 1000
+STREAM_BATCH_SIZE = 500
 
 
+def _json_array_chunks(rows, batch_size=STREAM_BATCH_SIZE):
+    """Yield a JSON array in batch-sized byte chunks.
 
+    Each batch is serialized independently and its surrounding brackets
+    stripped, so the concatenated chunks form one valid array without
+    ever materializing the full document.
+    """
+    yield b'['
+    for start in range(0, len(rows), batch_size):
+        if start:
+            yield b','
+        yield orjson.dumps(rows[start:start + batch_size])[1:-1]
+    yield b']'
 
 
+@app.get("/transactions", dependencies=[Depends(check_login)])
+async def list_transactions(request: Request):
+    rows = list(request.app.state.transactions_dict.values())
+    if len(rows) > STREAM_THRESHOLD:
+        return StreamingResponse(
+            _json_array_chunks(rows), media_type="application/json")
+    return rows
 
 
+@app.get("/transactions/{txn_id}", dependencies=[Depends(check_login)])
+async def get_transaction(txn_id: int, request: Request):
+    # DSA Efficiency: we use the dictionary here for O(1) lookup
+    txn = request.app.state.transactions_dict.get(txn_id)
+    if txn is None:
+        return ORJSONResponse({"error": "Transaction not found"}, status_code=404)
+    return txn
 
 
+@app.post("/transactions", dependencies=[Depends(check_login)], status_code=201)
+async def create_transaction(request: Request):
+    try:
+        new_data = orjson.loads(await request.body())
+    except Exception as e:
+        return ORJSONResponse({"error": str(e)}, status_code=400)
 
-    def do_PUT(self):
-        if not self.check_login():
-            self.send_response(401)
-            self.end_headers()
-            return
+    # Assign a new ID (just the next number in line)
+    state = request.app.state
+    new_id = state.next_id
+    state.next_id += 1
+    new_data['id'] = new_id
 
-        try:
-            txn_id = int(self.path.split('/')[-1])
-            length = int(self.headers.get('Content-Length', 0))
-            updated_fields = json.loads(self.rfile.read(length))
+    state.transactions_dict[new_id] = new_data
+    return new_data
 
-            # DSA Comparison: Using Linear Search (O(n)) to find the item in the list
-            for txn in transactions:
-                if txn['id'] == txn_id:
-                    txn.update(updated_fields)
-                    transactions_dict[txn_id] = txn # Update the dictionary too
-                    return self._send_json(txn)
 
+@app.put("/transactions/{txn_id}", dependencies=[Depends(check_login)])
+async def update_transaction(txn_id: int, request: Request):
+    try:
+        updated_fields = orjson.loads(await request.body())
+    except Exception:
+        return ORJSONResponse({"error": "Update failed"}, status_code=400)
 
-            self._send_json({"error": "Not found"}, 404)
+    # O(1) dict lookup replaces the old linear scan over the list
+    txn = request.app.state.transactions_dict.get(txn_id)
+    if txn is None:
+        return ORJSONResponse({"error": "Not found"}, status_code=404)
 
-        except Exception:
-            self._send_json({"error": "Update failed"}, 400)
+    txn.update(updated_fields)
+    return txn
 
-def do_DELETE(self):
 
-    if not self.check_login():
-        self.send_response(401)
-        self.end_headers()
-        return
+@app.delete("/transactions/{txn_id}", dependencies=[Depends(check_login)])
+async def delete_transaction(txn_id: int, request: Request):
+    # O(1) delete — ordering of the remaining entries is preserved by
+    # the dict itself, so there is no list to rebuild
+    if request.app.state.transactions_dict.pop(txn_id, None) is None:
+        return ORJSONResponse({"error": "ID not found"}, status_code=404)
 
-    try:
-        txn_id = int(self.path.split('/')[-1])
-        if txn_id in transactions_dict:
-            # Remove it from the dictionary (Fast)
-            del transactions_dict[txn_id]
-            # Re-build the list without that ID (Slower)
-            global transactions
-            transactions = [t for t in transactions if t['id'] != txn_id]
-
-            self._send_json({"message": "Transaction deleted successfully"})
-        else:
-            self._send_json({"error": "ID not found"}, 404)
+    return {"message": "Transaction deleted successfully"}
 
-    except Exception:
-        self._send_json({"error": "Delete failed"}, 400)
-
-    def _send_json(self, data, status=200):
-       
-        self.send_response(status)
-        self.send_header('Content-Type', 'application/json')
-        # We encode it to utf-8 so we don't get 'Parse Errors' in Postman
-        json_output = json.dumps(data).encode('utf-8')
-        self.send_header('Content-Length', str(len(json_output)))
-        self.end_headers()
-        self.wfile.write(json_output)
 
 # Start the engine
 if __name__ == '__main__':
-    load_parsed_data()
     port = 8000
-    server = HTTPServer(('localhost', port), APIHandler)
     print(f"--- MoMo API is live at http://localhost:{port} ---")
     print("Login: team5 | Password: ALU2025")
+    uvicorn.run(app, host='localhost', port=port)
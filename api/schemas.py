@@ -1,9 +1,21 @@
-from pydantic import BaseModel, Field, validator, constr
+from pydantic import BaseModel, ConfigDict, Field, validator, constr
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from enum import Enum
 from decimal import Decimal
 
+def _trusted_construct(cls, obj):
+    """Build a model from an already-validated ORM row without validation.
+
+    model_construct skips the per-field validator chain, which is the
+    dominant cost when shaping rows the database already guarantees.
+    from_attributes=True alone does not help — it still validates — so
+    the hot read paths go through this explicit bypass.
+    """
+    return cls.model_construct(
+        **{name: getattr(obj, name) for name in cls.model_fields})
+
+
 class TransactionTypeEnum(str, Enum):
     RECEIVED = "received"
     SENT = "sent"
@@ -14,6 +26,8 @@ class TransactionTypeEnum(str, Enum):
     BILL_PAYMENT = "bill_payment"
     CASH_POWER = "cash_power"
 
+_TX_TYPE_BY_VALUE = {member.value: member for member in TransactionTypeEnum}
+
 class UserBase(BaseModel):
     phone_number: str = Field(..., min_length=10, max_length=20)
     full_name: Optional[str] = Field(None, max_length=100)
@@ -32,9 +46,12 @@ class User(UserBase):
     id: int
     created_at: datetime
     updated_at: Optional[datetime]
-    
-    class Config:
-        from_attributes = True
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @classmethod
+    def from_orm_trusted(cls, obj):
+        return _trusted_construct(cls, obj)
 
 class SMSRecordBase(BaseModel):
     address: str
@@ -50,9 +67,9 @@ class SMSRecordCreate(SMSRecordBase):
 
 class SMSRecordUpdate(BaseModel):
     transaction_type: Optional[TransactionTypeEnum] = None
-    amount: Optional[Decimal] = None
-    fee: Optional[Decimal] = None
-    balance_after: Optional[Decimal] = None
+    amount: Optional[int] = None
+    fee: Optional[int] = None
+    balance_after: Optional[int] = None
     transaction_id: Optional[str] = None
     sender_name: Optional[str] = None
     receiver_name: Optional[str] = None
@@ -64,9 +81,10 @@ class SMSRecord(SMSRecordBase):
     type: int
     contact_name: str
     transaction_type: Optional[TransactionTypeEnum] = None
-    amount: Optional[Decimal] = None
-    fee: Decimal = Decimal('0.0')
-    balance_after: Optional[Decimal] = None
+    # Monetary values are whole RWF integers (see models.SMSRecord)
+    amount: Optional[int] = None
+    fee: int = 0
+    balance_after: Optional[int] = None
     transaction_id: Optional[str] = None
     external_transaction_id: Optional[str] = None
     transaction_date: Optional[datetime] = None
@@ -79,16 +97,25 @@ class SMSRecord(SMSRecordBase):
     message: Optional[str] = None
     token: Optional[str] = None
     is_parsed: bool = False
-    parse_errors: Optional[str] = None
     created_at: datetime
     updated_at: Optional[datetime]
     
     # Foreign keys
     sender_id: Optional[int] = None
     receiver_id: Optional[int] = None
-    
-    class Config:
-        from_attributes = True
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @classmethod
+    def from_orm_trusted(cls, obj):
+        record = _trusted_construct(cls, obj)
+        # The ORM enum is wider than the API one (unknown, commission,
+        # ...); re-key known values onto the API enum and pass the rest
+        # through as plain strings rather than failing the response
+        if (tx_type := record.transaction_type) is not None:
+            record.transaction_type = _TX_TYPE_BY_VALUE.get(
+                tx_type.value, tx_type.value)
+        return record
 
 class TransactionCategoryBase(BaseModel):
     name: str
@@ -100,9 +127,12 @@ class TransactionCategoryCreate(TransactionCategoryBase):
 
 class TransactionCategory(TransactionCategoryBase):
     id: int
-    
-    class Config:
-        from_attributes = True
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @classmethod
+    def from_orm_trusted(cls, obj):
+        return _trusted_construct(cls, obj)
 
 class SystemLogBase(BaseModel):
     level: str
@@ -117,9 +147,8 @@ class SystemLog(SystemLogBase):
     id: int
     user_id: Optional[int] = None
     created_at: datetime
-    
-    class Config:
-        from_attributes = True
+
+    model_config = ConfigDict(from_attributes=True)
 
 class OTPRecordBase(BaseModel):
     otp_code: str
@@ -134,9 +163,8 @@ class OTPRecord(OTPRecordBase):
     is_used: bool
     expires_at: datetime
     created_at: datetime
-    
-    class Config:
-        from_attributes = True
+
+    model_config = ConfigDict(from_attributes=True)
 
 # Complex JSON models for API responses
 class CompleteTransaction(BaseModel):
@@ -146,9 +174,8 @@ class CompleteTransaction(BaseModel):
     receiver: Optional[User] = None
     categories: List[TransactionCategory] = []
     logs: List[SystemLog] = []
-    
-    class Config:
-        from_attributes = True
+
+    model_config = ConfigDict(from_attributes=True)
 
 class DashboardStats(BaseModel):
     """Dashboard statistics"""
@@ -159,9 +186,8 @@ class DashboardStats(BaseModel):
     daily_volume: List[Dict[str, Any]]
     top_senders: List[Dict[str, Any]]
     top_receivers: List[Dict[str, Any]]
-    
-    class Config:
-        from_attributes = True
+
+    model_config = ConfigDict(from_attributes=True)
 
 class PaginatedResponse(BaseModel):
     """Generic paginated response"""
@@ -170,9 +196,8 @@ class PaginatedResponse(BaseModel):
     page: int
     size: int
     pages: int
-    
-    class Config:
-        from_attributes = True
+
+    model_config = ConfigDict(from_attributes=True)
 
 # Request/Response models for authentication
 class Token(BaseModel):
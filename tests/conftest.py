@@ -0,0 +1,180 @@
+"""
+Shared pytest configuration and database harness
+Team Eight: James Giir Deng & Byusa M Martin De Poles
+"""
+import os
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from api.main import app, verify_credentials
+from api.database import Base, get_db
+
+
+def worker_database_url() -> str:
+    """Build the in-memory test database URL for this pytest process.
+
+    Under pytest-xdist each worker process gets a private named in-memory
+    database (keyed by PYTEST_XDIST_WORKER), so workers never share state
+    and the suite can run with `pytest -n auto`. A plain single-process
+    run falls back to the "gw0" database.
+    """
+    worker = os.environ.get("PYTEST_XDIST_WORKER", "gw0")
+    return (
+        f"sqlite+pysqlite:///file:testdb_{worker}"
+        "?mode=memory&cache=shared&uri=true"
+    )
+
+
+# Test database: a shared-cache in-memory SQLite. An on-disk test.db
+# fsyncs every commit and leaves journal files behind; in-memory writes
+# are plain memcpys. cache=shared + StaticPool keep every connection
+# (test session and the app's overridden get_db sessions) on the same
+# database, which a plain :memory: URL would not — each connection would
+# get its own empty one. Living in conftest, the engine and schema are
+# built once per pytest invocation no matter how many test modules use
+# them.
+SQLALCHEMY_DATABASE_URL = worker_database_url()
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    poolclass=StaticPool,
+    connect_args={"check_same_thread": False, "uri": True},
+)
+
+# pysqlite's implicit transaction handling commits eagerly and breaks
+# SAVEPOINTs; take over BEGIN ourselves so the rollback-per-test recipe
+# below actually holds an open outer transaction. While we're on the raw
+# connection, drop every durability guarantee — test data is disposable,
+# so fsync, rollback journal and lock negotiation are pure overhead on
+# each committing POST/PUT/DELETE test.
+@event.listens_for(engine, "connect")
+def _tune_test_connection(dbapi_connection, connection_record):
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA synchronous=OFF")
+    cursor.execute("PRAGMA journal_mode=MEMORY")
+    cursor.execute("PRAGMA locking_mode=EXCLUSIVE")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-20000")
+    cursor.close()
+
+@event.listens_for(engine, "begin")
+def _emit_begin(conn):
+    conn.exec_driver_sql("BEGIN")
+
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Override get_db dependency. Registered once at import, before any
+# TestClient exists, so FastAPI resolves it from the overrides dict on
+# every request without rebuilding anything; the only per-request work
+# is one sessionmaker call. The test_db fixture swaps in its
+# connection-bound variant for the duration of a test.
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+app.dependency_overrides[get_db] = override_get_db
+
+# Short-circuit auth for the bulk of the suite: the credentials are
+# fixed, so re-verifying the same header on every request buys nothing.
+# The negative-path tests swap the real dependency back in via the
+# real_auth fixture below.
+app.dependency_overrides[verify_credentials] = lambda: "team5"
+
+@pytest.fixture
+def real_auth():
+    """Exercise the real Basic-auth dependency for the test's duration"""
+    override = app.dependency_overrides.pop(verify_credentials, None)
+    try:
+        yield
+    finally:
+        if override is not None:
+            app.dependency_overrides[verify_credentials] = override
+
+# Test client: one TestClient for the whole run, entered as a context
+# manager so FastAPI's startup/shutdown lifespan runs once instead of
+# never (module-level client) or per test. Also keeps a single
+# connection pool alive across tests.
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as c:
+        yield c
+
+@pytest.fixture(scope="session", autouse=True)
+def _schema():
+    """Create the schema once for the whole run.
+
+    DDL used to run per test (create_all/drop_all in every test_db); it is
+    by far the most expensive part of the harness, so it is amortized to a
+    single pass and isolation is handled by transaction rollback instead.
+    """
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture(scope="function")
+def test_db():
+    """Yield a session whose writes are rolled back after the test.
+
+    The session is bound to a connection with an open outer transaction;
+    join_transaction_mode="create_savepoint" turns the application's
+    commit() calls into SAVEPOINT releases, so rolling back the outer
+    transaction at teardown discards everything the test wrote — no
+    drop/recreate needed. This is the SQLAlchemy "join into an external
+    transaction" recipe.
+    """
+    connection = engine.connect()
+    trans = connection.begin()
+    session = TestingSessionLocal(
+        bind=connection, join_transaction_mode="create_savepoint"
+    )
+    connection_lock = threading.Lock()
+
+    def override_test_session():
+        # Each request gets its own Session on the same connection, so the
+        # app's commits land inside the outer transaction as SAVEPOINT
+        # releases while concurrent requests don't share Session state.
+        # The lock serializes DB access per request — a single Connection
+        # is not safe for concurrent use (test_concurrent_requests).
+        with connection_lock:
+            request_session = TestingSessionLocal(
+                bind=connection, join_transaction_mode="create_savepoint"
+            )
+            try:
+                yield request_session
+            finally:
+                request_session.close()
+
+    app.dependency_overrides[get_db] = override_test_session
+    try:
+        yield session
+    finally:
+        app.dependency_overrides[get_db] = override_get_db
+        session.close()
+        trans.rollback()
+        connection.close()
+
+@pytest.fixture
+def sql_log():
+    """Capture every SQL statement executed during the test.
+
+    Lets tests assert on the shape of the queries themselves — e.g. that
+    pagination pushes LIMIT down to the database instead of loading the
+    whole table and slicing in Python.
+    """
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    yield statements
+    event.remove(engine, "before_cursor_execute", record)